@@ -169,15 +169,16 @@ async def bancho_handler(
     if user.restricted:
         packet_map = app.state.RESTRICTED_PACKETS
 
-    for packet, handler in app.packets.PacketArray(bytearray(body), packet_map):
+    for packet, handler in app.packets.PacketArray(body, packet_map):
         await handler(packet, user)
 
-        if (
-            osu_packet := app.packets.Packets(packet.packet_id)
-        ) is not app.packets.Packets.OSU_PING:
-            log.debug(f"Packet {osu_packet!r} handled for {user}")
+        # only pay for the enum lookup when we're actually going to log it
+        if app.config.DEBUG and packet.packet_id != app.packets.Packets.OSU_PING:
+            log.debug(
+                f"Packet {app.packets.Packets(packet.packet_id)!r} handled for {user}",
+            )
 
-    await app.usecases.user.update_activity(user)
+    app.usecases.user.update_activity(user)
     return Response(user.dequeue())
 
 
@@ -287,9 +288,7 @@ async def login(
         channel_info_packet = app.packets.channel_info(channel)
         data += channel_info_packet
 
-        for target in app.state.sessions.users:
-            if channel.has_permission(target.privileges):
-                target.enqueue(channel_info_packet)
+        app.usecases.user.enqueue_channel_info(channel, channel_info_packet)
 
         if channel.auto_join:
             app.usecases.user.join_channel(user, channel)
@@ -305,9 +304,10 @@ async def login(
     user_data = app.packets.user_presence(user) + app.packets.user_stats(user)
     data += user_data
 
+    announce = not user.restricted
     for target in app.state.sessions.users:
-        if not user.restricted:
-            target.enqueue(user_data)
+        if announce:
+            target.queue.append(user_data)
 
         if not target.restricted:
             data += app.packets.user_presence(target) + app.packets.user_stats(target)
@@ -367,8 +367,8 @@ async def login(
         f"{user.name} logged in with osu! version {user.client_info.client} from {user.geolocation.country.acronym.upper()} in {formatted_time}",
     )
 
-    await app.usecases.user.update_activity(user)
-    user.login_time = int(time.time())
+    app.usecases.user.update_activity(user)
+    user.login_time = user.latest_activity  # same clock sample as the activity
 
     return {
         "token": user.token,
@@ -471,7 +471,7 @@ async def send_public_message(
         return
 
     target_channel.send(msg, user)
-    await app.usecases.user.update_activity(user)
+    app.usecases.user.update_activity(user)
 
     cmd = None
     if msg.startswith("!"):
@@ -500,7 +500,7 @@ async def logout(user: "User") -> None:
         return  # just osu things
 
     app.usecases.user.logout(user)
-    await app.usecases.user.update_activity(user)
+    app.usecases.user.update_activity(user)
 
 
 @register_packet(app.packets.Packets.OSU_REQUEST_STATUS_UPDATE, allow_restricted=True)
@@ -527,7 +527,7 @@ async def start_spectating(
                 fellow_joined = app.packets.spectator_joined(user.id)
                 for spec in host.spectators:
                     if spec is not user:
-                        user.enqueue(fellow_joined)
+                        spec.queue.append(fellow_joined)
 
             return
 
@@ -552,15 +552,15 @@ async def spectate_frames(
     user: "User",
     packet_data: app.models.SpectateFramesStructure,
 ) -> None:
-    if not user.spectating:
+    if not user.spectators:
         log.warning(
-            f"{user} tried to get spectate frames when they aren't spectating anyone",
+            f"{user} tried to send spectate frames when nobody is spectating them",
         )
         return
 
-    spec_frames = app.packets.spectate_frames(user.id, packet_data.frames)
+    spec_frames = app.packets.spectate_frames(packet_data.frame_bundle.serialise())
     for target in user.spectators:
-        target.enqueue(spec_frames)
+        target.queue.append(spec_frames)
 
 
 @register_packet(app.packets.Packets.OSU_CANT_SPECTATE)
@@ -576,7 +576,7 @@ async def cant_spectate(user: "User") -> None:
 
         user.spectating.enqueue(data)
         for target in user.spectating.spectators:
-            target.enqueue(data)
+            target.queue.append(data)
 
 
 @register_packet(app.packets.Packets.OSU_SEND_PRIVATE_MESSAGE)
@@ -624,7 +624,7 @@ async def private_message(
         return
 
     target.receive_message(msg, user)
-    await app.usecases.user.update_activity(user)
+    app.usecases.user.update_activity(user)
 
     cmd = None
     if msg.startswith("!"):
@@ -680,11 +680,11 @@ async def add_friend(
         log.warning(f"{user} tried to add {target}, but they are blocked")
         return
 
-    await app.usecases.user.update_activity(user)
+    app.usecases.user.update_activity(user)
     await app.usecases.user.add_friend(user, target)
 
 
-@register_packet(app.packets.Packets.OSU_FRIEND_ADD)
+@register_packet(app.packets.Packets.OSU_FRIEND_REMOVE)
 async def remove_friend(
     user: "User",
     packet_data: app.models.FriendStructure,
@@ -698,7 +698,7 @@ async def remove_friend(
     if target is app.state.sessions.bot:
         return
 
-    await app.usecases.user.update_activity(user)
+    app.usecases.user.update_activity(user)
     await app.usecases.user.remove_friend(user, target)
 
 
@@ -769,7 +769,7 @@ async def user_presence_request_all(user: "User") -> None:
 @register_packet(app.packets.Packets.OSU_TOGGLE_BLOCK_NON_FRIEND_DMS)
 async def toggle_dms(user: "User", packet_data: app.models.ToggleDMStructure) -> None:
     user.friend_only_dms = packet_data.value == 1
-    await app.usecases.user.update_activity(user)
+    app.usecases.user.update_activity(user)
 
 
 @register_packet(app.packets.Packets.OSU_JOIN_LOBBY)
@@ -813,7 +813,7 @@ async def create_match(user: "User", packet_data: app.models.MatchStructure) ->
     app.state.sessions.channels.append(channel)
     match.chat = channel
 
-    await app.usecases.user.update_activity(user)
+    app.usecases.user.update_activity(user)
     app.usecases.user.join_match(user, match, match.password)
 
     log.info(f"{user} created new multiplayer match {match}")
@@ -835,13 +835,13 @@ async def join_match(user: "User", packet_data: app.models.JoinMatchStructure) -
         )
         user.enqueue(app.packets.match_join_fail())
 
-    await app.usecases.user.update_activity(user)
+    app.usecases.user.update_activity(user)
     app.usecases.user.join_match(user, match, packet_data.match_password)
 
 
 @register_packet(app.packets.Packets.OSU_PART_MATCH)
 async def leave_match(user: "User") -> None:
-    await app.usecases.user.update_activity(user)
+    app.usecases.user.update_activity(user)
     app.usecases.user.leave_match(user)
 
 
@@ -1266,7 +1266,7 @@ async def match_invite(
         return
 
     target.enqueue(app.packets.match_invite(user, target.name))
-    await app.usecases.user.update_activity(user)
+    app.usecases.user.update_activity(user)
 
     log.info(f"{user} invited {target} to their match")
 
@@ -199,5 +199,4 @@ async def initialise_pubsubs() -> None:
     pubsub = app.state.services.redis.pubsub()
     await pubsub.subscribe(*[channel for channel in app.state.PUBSUBS.keys()])
 
-    pubsub_loop = asyncio.create_task(loop_pubsubs(pubsub))
-    app.state.tasks.add(pubsub_loop)
+    app.state.create_task(loop_pubsubs(pubsub))
@@ -64,3 +64,7 @@ class Mode(IntEnum):
             return Mode.STD_AP
 
         return Mode(mode)
+
+
+# iterating a tuple skips EnumMeta.__iter__ on every pass
+MODES = tuple(Mode)
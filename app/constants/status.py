@@ -8,7 +8,7 @@ from app.constants.mode import Mode
 from app.constants.mods import Mods
 
 
-@dataclass
+@dataclass(frozen=True)
 class Status:
     action: Action
     info_text: str
@@ -19,14 +19,7 @@ class Status:
 
     @classmethod
     def default(cls) -> Status:
-        return Status(
-            Action.IDLE,
-            "",
-            "",
-            Mods.NOMOD,
-            Mode.STD,
-            0,
-        )
+        return DEFAULT_STATUS
 
     @classmethod
     def from_dict(cls, status: dict[str, Any]) -> Status:
@@ -38,3 +31,14 @@ class Status:
             Mode(status["mode"]),
             status["map_id"],
         )
+
+
+# statuses are immutable, so every fresh session can share this one
+DEFAULT_STATUS = Status(
+    Action.IDLE,
+    "",
+    "",
+    Mods.NOMOD,
+    Mode.STD,
+    0,
+)
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import pprint
 
+from aiohttp import ClientSession
+from aiohttp import TCPConnector
 from fastapi import FastAPI
 from fastapi import status
 from fastapi.encoders import jsonable_encoder
@@ -25,17 +27,32 @@ def init_events(asgi_app: FastAPI) -> None:
         app.state.services.client = AsyncIOMotorClient(str(app.config.MONGODB_DSN))
         app.state.services.database = app.state.services.client.aisuru
 
+        # shared across requests so connections and dns lookups are reused
+        app.state.services.http = ClientSession(
+            connector=TCPConnector(ttl_dns_cache=300),
+        )
+
         await app.state.services.redis.initialize()
         await app.state.sessions.populate_sessions()
         await app.api.redis.initialise_pubsubs()
 
+        app.state.create_task(app.usecases.user.flush_activity_loop())
+
         log.info("Bancho is running!")
 
     @asgi_app.on_event("shutdown")
     async def on_shutdown() -> None:
-        await app.state.services.redis.close()
         await app.state.cancel_tasks()
 
+        try:
+            await app.usecases.user.flush_activity()
+        except Exception as exc:
+            log.error(f"Failed to flush user activity on shutdown: {exc}")
+
+        await app.state.services.redis.close()
+        await app.state.services.http.close()
+        app.usecases.password.executor.shutdown(wait=False)
+
         log.info("Bancho has stopped!")
 
     @asgi_app.middleware("http")
@@ -27,7 +27,7 @@ class DBUser(BaseModel):
     privileges: Privileges
     silence_end: int
 
-    friends: list[int]
+    friends: set[int]
     blocked: list[int]
 
 
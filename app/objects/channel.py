@@ -96,4 +96,4 @@ class Channel:
             if user.id in immune:
                 continue
 
-            user.enqueue(data)
+            user.queue.append(data)
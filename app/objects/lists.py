@@ -23,14 +23,22 @@ class UserList(list["User"]):
         self.lock = asyncio.Lock()
         super().__init__(*args, **kwargs)
 
+        # lookup indexes, kept in step by append/remove. an account can have
+        # several sessions (tourney clients), the earliest one is indexed
+        self.by_id: dict[int, User] = {}
+        self.by_name: dict[str, User] = {}
+        self.by_token: dict[str, User] = {}
+        for user in self:
+            self._index(user)
+
     def __iter__(self) -> Iterator[User]:
         return super().__iter__()
 
     def __contains__(self, user: Union[User, str, int]) -> bool:
         if isinstance(user, str):
-            return user in [name for name in self.names]
+            return user in self.by_name
         elif isinstance(user, int):
-            return user in [id for id in self.ids]
+            return user in self.by_id
         else:
             return super().__contains__(user)
 
@@ -58,15 +66,23 @@ class UserList(list["User"]):
         return [user for user in self if not user.privileges & Privileges.RESTRICTED]
 
     def enqueue(self, data: bytes, immune: list[int] = []) -> None:
+        # most broadcasts (logouts, stats) have nobody to skip
+        if not immune:
+            for user in self:
+                user.queue.append(data)
+
+            return
+
         for user in self:
             if user.id not in immune:
-                user.enqueue(data)
+                user.queue.append(data)
 
     def append(self, user: User) -> None:
         if user in self:
             return
 
         super().append(user)
+        self._index(user)
 
     def remove(self, user: User) -> None:
         if user not in self:
@@ -74,14 +90,44 @@ class UserList(list["User"]):
 
         super().remove(user)
 
+        for index, attr in (
+            (self.by_id, "id"),
+            (self.by_name, "name"),
+            (self.by_token, "token"),
+        ):
+            key = getattr(user, attr)
+            if index.get(key) is not user:
+                continue
+
+            # hand the key over to another session of the same account
+            for other in self:
+                if getattr(other, attr) == key:
+                    index[key] = other
+                    break
+            else:
+                del index[key]
+
+    def _index(self, user: User) -> None:
+        self.by_id.setdefault(user.id, user)
+        self.by_name.setdefault(user.name, user)
+        self.by_token.setdefault(user.token, user)
+
 
 class ChannelList(list["Channel"]):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # lookup index, kept in step by append/extend/remove
+        self.by_name: dict[str, Channel] = {}
+        for channel in self:
+            self.by_name.setdefault(channel.real_name, channel)
+
     def __iter__(self) -> Iterator[Channel]:
         return super().__iter__()
 
     def __contains__(self, o: Union[Channel, str]) -> bool:
         if isinstance(o, str):
-            return o in (chan.real_name for chan in self)
+            return o in self.by_name
         else:
             return super().__contains__(o)
 
@@ -107,22 +153,27 @@ class ChannelList(list["Channel"]):
             return super().__getitem__(index)
 
     def get_by_name(self, name: str) -> Optional[Channel]:
-        for channel in self:
-            if channel.real_name == name:
-                return channel
+        return self.by_name.get(name)
 
     def append(self, channel: Channel) -> None:
         super().append(channel)
+        self.by_name.setdefault(channel.real_name, channel)
 
         log.debug(f"{channel} added to channels list.")
 
     def extend(self, channels: Iterable[Channel]) -> None:
+        channels = list(channels)
+
         super().extend(channels)
+        for channel in channels:
+            self.by_name.setdefault(channel.real_name, channel)
 
         log.debug(f"{channels} added to channels list.")
 
     def remove(self, channel: Channel) -> None:
         super().remove(channel)
+        if self.by_name.get(channel.real_name) is channel:
+            del self.by_name[channel.real_name]
 
         log.debug(f"{channel} removed from channels list.")
 
@@ -95,6 +95,7 @@ class Match:
 
         self.chat: Optional[Channel] = None
         self.slots = [Slot() for _ in range(16)]  # osu can handle up to 16 users
+        self.occupied_count = 0  # kept in step by join_match/leave_match
 
         self.team_type = MatchTeamTypes.HEAD_TO_HEAD
         self.win_condition = MatchWinConditions.SCORE
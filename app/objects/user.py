@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import time
+from collections import deque
 from dataclasses import dataclass
 from datetime import date
 from functools import cached_property
@@ -80,13 +81,13 @@ class User:
     login_time: int
 
     token: str
-    queue: bytearray
+    queue: deque[Union[bytearray, bytes]]
 
     stats: dict[Mode, Stats]
-    friends: list[int]
+    friends: set[int]
     blocked: list[int]
 
-    channels: list[Channel]
+    channels: set[Channel]
 
     spectating: Optional[User]
     spectators: list[User]
@@ -113,8 +114,8 @@ class User:
             "status": self.status.__dict__,
             "login_time": self.login_time,
             "latest_activity": self.latest_activity,
-            "geolocation": self.geolocation.__dict__,
-            "friends": self.friends,
+            "geolocation": self.geolocation.dict(),
+            "friends": sorted(self.friends),
             "privileges": self.privileges.value,
         }
 
@@ -171,11 +172,12 @@ class User:
         return self.privileges & Privileges.FROZEN
 
     def enqueue(self, data: Union[bytearray, bytes]) -> None:
-        self.queue += data
+        # shared packets are referenced, not copied, until the next dequeue
+        self.queue.append(data)
 
     def dequeue(self) -> Optional[bytes]:
         if self.queue:
-            data = bytes(self.queue)
+            data = b"".join(self.queue)
             self.queue.clear()
 
             return data
@@ -4,16 +4,21 @@ import struct
 from enum import IntEnum
 from functools import cache
 from functools import lru_cache
+from typing import Any
 from typing import Iterator
+from typing import Optional
 from typing import TYPE_CHECKING
+from typing import Union
 
 from app.constants.action import Action
 from app.constants.mode import Mode
 from app.constants.mods import Mods
+from app.objects.match import SlotStatus
 
 if TYPE_CHECKING:
     from app.objects.channel import Channel
     from app.objects.match import Match
+    from app.objects.match import MatchTeams
     from app.objects.user import User
 
 from app.typing import OsuChannel, OsuMatch
@@ -25,43 +30,44 @@ from app.typing import i64
 from app.typing import Message
 from app.typing import PacketHandler
 from app.typing import String
-from app.typing import u32
 from app.typing import u8
 
 
+HEADER_FMT = struct.Struct("<HxI")  # packet id, padding byte, length
+
+
 class Packet:
-    def __init__(self, packet_id: int, length: int, data: bytearray):
-        self.data: bytearray = data
+    __slots__ = ("data", "packet_id", "length", "offset")
+
+    def __init__(
+        self,
+        packet_id: int,
+        length: int,
+        data: Union[bytearray, memoryview],
+    ):
+        # incoming packets are memoryviews into the request body
+        self.data: Union[bytearray, memoryview] = data
         self.packet_id: int = packet_id
         self.length: int = length
 
-    def read_header(self) -> None:
-        array = self.read(7)
-        data = struct.unpack("<HxI", array)
-
-        self.packet_id = data[0]
-        self.length = data[1]
-
-    @classmethod
-    def from_data(self, data: bytearray) -> Packet:
-        packet = Packet(0, 0, data)
-
-        packet.read_header()
-        return packet
+        self.offset = 0  # read cursor into data
 
     @classmethod
     def from_id(self, packet_id: int) -> Packet:
         return Packet(packet_id, 0, bytearray())
 
-    def offset(self, count: int) -> None:
-        self.data = self.data[count:]
-
     def read(self, count: int) -> bytearray:
-        data = self.data[:count]
-        self.offset(count)
+        data = self.data[self.offset : self.offset + count]
+        self.offset += count
 
         return data
 
+    def unpack(self, fmt: struct.Struct) -> tuple[Any, ...]:
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+
+        return values
+
     def __iadd__(self, other: bytearray) -> Packet:
         self.write(other)
         return self
@@ -70,52 +76,45 @@ class Packet:
         self.data += data
 
     def serialise(self) -> bytearray:
-        return_data = bytearray()
-
-        return_data += i16.write(self.packet_id)
-        return_data += u8.write(0)  # padding byte
-
-        # actual packet data
-        return_data += u32.write(len(self.data))
-        return_data += self.data
+        return write_raw(self.packet_id, self.data)
 
-        return return_data
 
+def write_raw(packet_id: int, data: bytes) -> bytearray:
+    # single allocation for the hot builders which already have their payload
+    packet = bytearray(HEADER_FMT.size + len(data))
 
-def parse_header(data: bytearray) -> tuple[int, int]:
-    header = data[:7]
-    data = struct.unpack("<HxI", header)
+    HEADER_FMT.pack_into(packet, 0, packet_id, len(data))
+    packet[HEADER_FMT.size :] = data
 
-    return data[0], data[1]  # packet id, length
+    return packet
 
 
 class PacketArray:
-    def __init__(self, data: bytearray, packet_map: dict[int, PacketHandler]) -> None:
-        self.data = data
-        self.packets: list[Packet] = []
+    def __init__(
+        self,
+        data: bytes,
+        packet_map: list[Optional[PacketHandler]],
+    ) -> None:
+        self.data = memoryview(data)
         self.packet_map = packet_map
 
-        self._split_data()
-
     def __iter__(self) -> Iterator[tuple[Packet, PacketHandler]]:
-        for packet in self.packets:
-            handler = self.packet_map[packet.packet_id]
+        # walk the body in place, packets are views into it rather than copies
+        data = self.data
+        packet_map = self.packet_map
+        map_size = len(packet_map)
 
-            yield packet, handler
+        offset = 0
+        while offset + 7 <= len(data):
+            packet_id, length = HEADER_FMT.unpack_from(data, offset)
 
-    def _split_data(self) -> None:
-        while self.data:
-            packet_id, length = parse_header(self.data)
+            start = offset + 7
+            offset = start + length
 
-            if packet_id not in self.packet_map.keys():
-                self.data = self.data[7 + length :]
+            if packet_id >= map_size or (handler := packet_map[packet_id]) is None:
                 continue
 
-            packet_data = self.data[: 7 + length]
-            packet = Packet.from_data(packet_data)
-            self.packets.append(packet)
-
-            self.data = self.data[7 + length :]
+            yield Packet(packet_id, length, data[start:offset]), handler
 
 
 class Packets(IntEnum):
@@ -228,39 +227,79 @@ class Packets(IntEnum):
     OSU_TOURNAMENT_JOIN_MATCH_CHANNEL = 108
     OSU_TOURNAMENT_LEAVE_MATCH_CHANNEL = 109
 
-    def __repr__(self) -> str:
-        return f"<{self.name} ({self.value})>"
+
+# plain int ids for the builders, avoids an enum member lookup per packet
+_P_USER_ID = Packets.CHO_USER_ID.value
+_P_SEND_MESSAGE = Packets.CHO_SEND_MESSAGE.value
+_P_PONG = Packets.CHO_PONG.value
+_P_USER_STATS = Packets.CHO_USER_STATS.value
+_P_USER_LOGOUT = Packets.CHO_USER_LOGOUT.value
+_P_SPECTATOR_JOINED = Packets.CHO_SPECTATOR_JOINED.value
+_P_SPECTATOR_LEFT = Packets.CHO_SPECTATOR_LEFT.value
+_P_SPECTATE_FRAMES = Packets.CHO_SPECTATE_FRAMES.value
+_P_SPECTATOR_CANT_SPECTATE = Packets.CHO_SPECTATOR_CANT_SPECTATE.value
+_P_NOTIFICATION = Packets.CHO_NOTIFICATION.value
+_P_UPDATE_MATCH = Packets.CHO_UPDATE_MATCH.value
+_P_NEW_MATCH = Packets.CHO_NEW_MATCH.value
+_P_DISPOSE_MATCH = Packets.CHO_DISPOSE_MATCH.value
+_P_MATCH_JOIN_SUCCESS = Packets.CHO_MATCH_JOIN_SUCCESS.value
+_P_MATCH_JOIN_FAIL = Packets.CHO_MATCH_JOIN_FAIL.value
+_P_FELLOW_SPECTATOR_JOINED = Packets.CHO_FELLOW_SPECTATOR_JOINED.value
+_P_FELLOW_SPECTATOR_LEFT = Packets.CHO_FELLOW_SPECTATOR_LEFT.value
+_P_MATCH_START = Packets.CHO_MATCH_START.value
+_P_MATCH_TRANSFER_HOST = Packets.CHO_MATCH_TRANSFER_HOST.value
+_P_MATCH_ALL_PLAYERS_LOADED = Packets.CHO_MATCH_ALL_PLAYERS_LOADED.value
+_P_MATCH_PLAYER_FAILED = Packets.CHO_MATCH_PLAYER_FAILED.value
+_P_MATCH_COMPLETE = Packets.CHO_MATCH_COMPLETE.value
+_P_MATCH_SKIP = Packets.CHO_MATCH_SKIP.value
+_P_CHANNEL_JOIN_SUCCESS = Packets.CHO_CHANNEL_JOIN_SUCCESS.value
+_P_CHANNEL_INFO = Packets.CHO_CHANNEL_INFO.value
+_P_CHANNEL_KICK = Packets.CHO_CHANNEL_KICK.value
+_P_PRIVILEGES = Packets.CHO_PRIVILEGES.value
+_P_FRIENDS_LIST = Packets.CHO_FRIENDS_LIST.value
+_P_PROTOCOL_VERSION = Packets.CHO_PROTOCOL_VERSION.value
+_P_MAIN_MENU_ICON = Packets.CHO_MAIN_MENU_ICON.value
+_P_MATCH_PLAYER_SKIPPED = Packets.CHO_MATCH_PLAYER_SKIPPED.value
+_P_USER_PRESENCE = Packets.CHO_USER_PRESENCE.value
+_P_RESTART = Packets.CHO_RESTART.value
+_P_MATCH_INVITE = Packets.CHO_MATCH_INVITE.value
+_P_CHANNEL_INFO_END = Packets.CHO_CHANNEL_INFO_END.value
+_P_SILENCE_END = Packets.CHO_SILENCE_END.value
+_P_USER_DM_BLOCKED = Packets.CHO_USER_DM_BLOCKED.value
+_P_TARGET_IS_SILENCED = Packets.CHO_TARGET_IS_SILENCED.value
+_P_VERSION_UPDATE_FORCED = Packets.CHO_VERSION_UPDATE_FORCED.value
+_P_ACCOUNT_RESTRICTED = Packets.CHO_ACCOUNT_RESTRICTED.value
 
 
 @cache
 def pong() -> bytearray:
-    packet = Packet.from_id(Packets.CHO_PONG)
+    packet = Packet(_P_PONG, 0, bytearray())
     return packet.serialise()
 
 
 @cache
 def user_id(id: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_USER_ID)
+    packet = Packet(_P_USER_ID, 0, bytearray())
     packet += i32.write(id)
     return packet.serialise()
 
 
 @cache
 def protocol_version(version: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_PROTOCOL_VERSION)
+    packet = Packet(_P_PROTOCOL_VERSION, 0, bytearray())
     packet += i32.write(version)
     return packet.serialise()
 
 
 @cache
 def bancho_privileges(priv: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_PRIVILEGES)
+    packet = Packet(_P_PRIVILEGES, 0, bytearray())
     packet += i32.write(priv)
     return packet.serialise()
 
 
 def bot_presence(user: User) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_USER_PRESENCE)
+    packet = Packet(_P_USER_PRESENCE, 0, bytearray())
 
     packet += i32.write(user.id)
     packet += String.write(user.name)
@@ -278,7 +317,7 @@ def user_presence(user: User) -> bytearray:
     if user.id == 1:
         return bot_presence(user)
 
-    packet = Packet.from_id(Packets.CHO_USER_PRESENCE)
+    packet = Packet(_P_USER_PRESENCE, 0, bytearray())
 
     packet += i32.write(user.id)
     packet += String.write(user.name)
@@ -293,7 +332,7 @@ def user_presence(user: User) -> bytearray:
 
 
 def bot_stats(user: User) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_USER_STATS)
+    packet = Packet(_P_USER_STATS, 0, bytearray())
 
     packet += i32.write(user.id)
     packet += u8.write(Action.WATCHING.value)
@@ -316,7 +355,7 @@ def user_stats(user: User) -> bytearray:
     if user.id == 1:
         return bot_stats(user)
 
-    packet = Packet.from_id(Packets.CHO_USER_STATS)
+    packet = Packet(_P_USER_STATS, 0, bytearray())
 
     stats = user.current_stats
     if stats.pp > 0x7FFF:
@@ -345,53 +384,51 @@ def user_stats(user: User) -> bytearray:
 
 @lru_cache(maxsize=4)
 def notification(msg: str) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_NOTIFICATION)
+    packet = Packet(_P_NOTIFICATION, 0, bytearray())
     packet += String.write(msg)
     return packet.serialise()
 
 
 @cache
 def channel_info_end() -> bytearray:
-    packet = Packet.from_id(Packets.CHO_CHANNEL_INFO_END)
+    packet = Packet(_P_CHANNEL_INFO_END, 0, bytearray())
     return packet.serialise()
 
 
 @cache
 def restart_server(time: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_RESTART)
+    packet = Packet(_P_RESTART, 0, bytearray())
     packet += i32.write(time)
     return packet.serialise()
 
 
 @cache
 def menu_icon(icon_url: str, click_url: str) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_MAIN_MENU_ICON)
+    packet = Packet(_P_MAIN_MENU_ICON, 0, bytearray())
     packet += String.write(f"{icon_url}|{click_url}")  # TODO: implement
     return packet.serialise()
 
 
 def friends_list(friends_list: set[int]) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_FRIENDS_LIST)
+    packet = Packet(_P_FRIENDS_LIST, 0, bytearray())
     packet += i32_list.write(friends_list)
     return packet.serialise()
 
 
 @cache
 def silence_end(time: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_SILENCE_END)
+    packet = Packet(_P_SILENCE_END, 0, bytearray())
     packet += i32.write(time)
     return packet.serialise()
 
 
 def send_message(message: Message) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_SEND_MESSAGE)
-    packet += message.serialise()
-    return packet.serialise()
+    return write_raw(_P_SEND_MESSAGE, message.serialise())
 
 
 @cache
 def logout(user_id: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_USER_LOGOUT)
+    packet = Packet(_P_USER_LOGOUT, 0, bytearray())
 
     packet += i32.write(user_id)
     packet += u8.write(0)  # ?
@@ -401,60 +438,58 @@ def logout(user_id: int) -> bytearray:
 
 @cache
 def block_dm() -> bytearray:
-    packet = Packet.from_id(Packets.CHO_USER_DM_BLOCKED)
+    packet = Packet(_P_USER_DM_BLOCKED, 0, bytearray())
     return packet.serialise()
 
 
 @cache
 def spectator_joined(user_id: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_FELLOW_SPECTATOR_JOINED)
+    packet = Packet(_P_FELLOW_SPECTATOR_JOINED, 0, bytearray())
     packet += i32.write(user_id)
     return packet.serialise()
 
 
 @cache
 def host_spectator_joined(user_id: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_SPECTATOR_JOINED)
+    packet = Packet(_P_SPECTATOR_JOINED, 0, bytearray())
     packet += i32.write(user_id)
     return packet.serialise()
 
 
 @cache
 def spectator_left(user_id: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_FELLOW_SPECTATOR_LEFT)
+    packet = Packet(_P_FELLOW_SPECTATOR_LEFT, 0, bytearray())
     packet += i32.write(user_id)
     return packet.serialise()
 
 
 @cache
 def host_spectator_left(user_id: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_SPECTATOR_LEFT)
+    packet = Packet(_P_SPECTATOR_LEFT, 0, bytearray())
     packet += i32.write(user_id)
     return packet.serialise()
 
 
 def spectate_frames(frames: bytes) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_SPECTATE_FRAMES)
-    packet += frames
-    return packet.serialise()
+    return write_raw(_P_SPECTATE_FRAMES, frames)
 
 
 @cache
 def cant_spectate(user_id: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_SPECTATOR_CANT_SPECTATE)
+    packet = Packet(_P_SPECTATOR_CANT_SPECTATE, 0, bytearray())
     packet += i32.write(user_id)
     return packet.serialise()
 
 
-@lru_cache(maxsize=8)
+@cache
 def join_channel(channel: str) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_CHANNEL_JOIN_SUCCESS)
+    packet = Packet(_P_CHANNEL_JOIN_SUCCESS, 0, bytearray())
     packet += String.write(channel)
     return packet.serialise()
 
 
 def channel_info(channel: Channel) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_CHANNEL_INFO)
+    packet = Packet(_P_CHANNEL_INFO, 0, bytearray())
 
     osu_channel = OsuChannel(channel.name, channel.topic, channel.user_count)
     packet += osu_channel.serialise()
@@ -462,47 +497,63 @@ def channel_info(channel: Channel) -> bytearray:
     return packet.serialise()
 
 
-@lru_cache(maxsize=8)
+@cache
 def channel_kick(channel: str) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_CHANNEL_KICK)
+    packet = Packet(_P_CHANNEL_KICK, 0, bytearray())
     packet += String.write(channel)
     return packet.serialise()
 
 
-@lru_cache(maxsize=16)
+@cache
 def channel_join(channel: str) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_CHANNEL_JOIN_SUCCESS)
+    packet = Packet(_P_CHANNEL_JOIN_SUCCESS, 0, bytearray())
     packet += String.write(channel)
     return packet.serialise()
 
 
 @cache
 def version_update_forced() -> bytearray:
-    packet = Packet.from_id(Packets.CHO_VERSION_UPDATE_FORCED)
+    packet = Packet(_P_VERSION_UPDATE_FORCED, 0, bytearray())
     return packet.serialise()
 
 
 @cache
 def user_restricted() -> bytearray:
-    packet = Packet.from_id(Packets.CHO_ACCOUNT_RESTRICTED)
+    packet = Packet(_P_ACCOUNT_RESTRICTED, 0, bytearray())
     return packet.serialise()
 
 
 @lru_cache(maxsize=8)
 def target_silenced(target_name: str) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_TARGET_IS_SILENCED)
+    packet = Packet(_P_TARGET_IS_SILENCED, 0, bytearray())
     packet += Message.write("", "", target_name, 0)
     return packet.serialise()
 
 
 @lru_cache(maxsize=8)
 def private_message_blocked(target_name: str) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_USER_DM_BLOCKED)
+    packet = Packet(_P_USER_DM_BLOCKED, 0, bytearray())
     packet += Message.write("", "", target_name, 0)
     return packet.serialise()
 
 
 def write_match(match: Match) -> OsuMatch:
+    slot_ids: list[int] = []
+    slot_statuses: list[SlotStatus] = []
+    slot_teams: list[MatchTeams] = []
+    slot_mods: list[Mods] = []
+
+    # single walk over the slots rather than one per field
+    for slot in match.slots:
+        # the client only reads an id for slots flagged as holding a user,
+        # a locked slot keeps its user but must not send the id
+        if slot.user and slot.status & SlotStatus.HAS_USER:
+            slot_ids.append(slot.user.id)
+
+        slot_statuses.append(slot.status)
+        slot_teams.append(slot.team)
+        slot_mods.append(slot.mods)
+
     return OsuMatch(
         match.id,
         match.in_progress,
@@ -512,21 +563,21 @@ def write_match(match: Match) -> OsuMatch:
         match.map_name,
         match.map_id,
         match.map_md5,
-        [slot.user.id for slot in match.slots if slot.user],
+        slot_ids,
         match.win_condition,
         match.team_type,
         match.freemod,
         match.seed,
-        [slot.status for slot in match.slots],
-        [slot.team for slot in match.slots],
-        [slot.mods for slot in match.slots],
+        slot_statuses,
+        slot_teams,
+        slot_mods,
         match.mode,
         match.host_id,
     )
 
 
 def update_match(match: Match, send_pw: bool = True) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_UPDATE_MATCH)
+    packet = Packet(_P_UPDATE_MATCH, 0, bytearray())
 
     osu_match = write_match(match)
 
@@ -535,7 +586,7 @@ def update_match(match: Match, send_pw: bool = True) -> bytearray:
 
 
 def match_start(match: Match) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_MATCH_START)
+    packet = Packet(_P_MATCH_START, 0, bytearray())
 
     osu_match = write_match(match)
 
@@ -544,7 +595,7 @@ def match_start(match: Match) -> bytearray:
 
 
 def new_match(match: Match) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_NEW_MATCH)
+    packet = Packet(_P_NEW_MATCH, 0, bytearray())
 
     osu_match = write_match(match)
 
@@ -554,12 +605,12 @@ def new_match(match: Match) -> bytearray:
 
 @cache
 def match_join_fail() -> bytearray:
-    packet = Packet.from_id(Packets.CHO_MATCH_JOIN_FAIL)
+    packet = Packet(_P_MATCH_JOIN_FAIL, 0, bytearray())
     return packet.serialise()
 
 
 def match_join_success(match: Match) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_MATCH_JOIN_SUCCESS)
+    packet = Packet(_P_MATCH_JOIN_SUCCESS, 0, bytearray())
 
     osu_match = write_match(match)
 
@@ -569,53 +620,53 @@ def match_join_success(match: Match) -> bytearray:
 
 @cache
 def dispose_match(match_id: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_DISPOSE_MATCH)
+    packet = Packet(_P_DISPOSE_MATCH, 0, bytearray())
     packet += i32.write(match_id)
     return packet.serialise()
 
 
 @cache
 def match_transfer_host() -> bytearray:
-    packet = Packet.from_id(Packets.CHO_MATCH_TRANSFER_HOST)
+    packet = Packet(_P_MATCH_TRANSFER_HOST, 0, bytearray())
     return packet.serialise()
 
 
 @cache
 def match_complete() -> bytearray:
-    packet = Packet.from_id(Packets.CHO_MATCH_COMPLETE)
+    packet = Packet(_P_MATCH_COMPLETE, 0, bytearray())
     return packet.serialise()
 
 
 @cache
 def match_all_players_loaded() -> bytearray:
-    packet = Packet.from_id(Packets.CHO_MATCH_ALL_PLAYERS_LOADED)
+    packet = Packet(_P_MATCH_ALL_PLAYERS_LOADED, 0, bytearray())
     return packet.serialise()
 
 
 @cache
 def match_player_failed(slot_id: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_MATCH_PLAYER_FAILED)
+    packet = Packet(_P_MATCH_PLAYER_FAILED, 0, bytearray())
     packet += i32.write(slot_id)
     return packet.serialise()
 
 
 @cache
 def match_player_skipped(user_id: int) -> bytearray:
-    packet = Packet.from_id(Packets.CHO_MATCH_PLAYER_SKIPPED)
+    packet = Packet(_P_MATCH_PLAYER_SKIPPED, 0, bytearray())
     packet += i32.write(user_id)
     return packet.serialise()
 
 
 @cache
 def match_skip() -> bytearray:
-    packet = Packet.from_id(Packets.CHO_MATCH_SKIP)
+    packet = Packet(_P_MATCH_SKIP, 0, bytearray())
     return packet.serialise()
 
 
 def match_invite(user: User, target_name: str) -> bytearray:
     invite_text = f"Join my multiplayer match: {user.match.embed}"
 
-    packet = Packet.from_id(Packets.CHO_MATCH_INVITE)
+    packet = Packet(_P_MATCH_INVITE, 0, bytearray())
     packet += Message.write(
         user.name,
         invite_text,
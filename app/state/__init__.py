@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import asyncio
 from typing import Any
+from typing import Coroutine
+from typing import Optional
 
 import log
 from . import cache
@@ -10,8 +12,9 @@ from . import sessions
 from app.typing import PacketHandler
 from app.typing import PubsubHandler
 
-PACKETS: dict[int, PacketHandler] = {}
-RESTRICTED_PACKETS: dict[int, PacketHandler] = {}
+# packet ids are small & dense, so index handlers directly by id
+PACKETS: list[Optional[PacketHandler]] = [None] * 128
+RESTRICTED_PACKETS: list[Optional[PacketHandler]] = [None] * 128
 
 PUBSUBS: dict[str, PubsubHandler] = {}
 
@@ -19,22 +22,32 @@ tasks: set[asyncio.Task] = set()
 commands: dict[str, Any] = {}
 
 
+def create_task(coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
+    return task
+
+
 async def cancel_tasks() -> None:
     log.info(f"Cancelling {len(tasks)} tasks.")
 
-    for task in tasks:
+    # tasks discard themselves once done, so hold onto them until we're finished
+    running = list(tasks)
+    for task in running:
         task.cancel()
 
-    await asyncio.gather(*tasks, return_exceptions=True)
+    results = await asyncio.gather(*running, return_exceptions=True)
 
     loop = asyncio.get_running_loop()
-    for task in tasks:
-        if not task.cancelled():
-            if exception := task.exception():
-                loop.call_exception_handler(
-                    {
-                        "message": "unhandled exception during loop shutdown",
-                        "exception": exception,
-                        "task": task,
-                    },
-                )
+    for task, exception in zip(running, results):
+        if isinstance(exception, Exception):
+            loop.call_exception_handler(
+                {
+                    "message": "unhandled exception during loop shutdown",
+                    "exception": exception,
+                    "task": task,
+                },
+            )
@@ -1,6 +1,24 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
 from app.state.services import Geolocation
 
+if TYPE_CHECKING:
+    from app.objects.beatmap import Beatmap
+
 IPAddress = str
 geoloc: dict[IPAddress, Geolocation] = {}
+
+BEATMAP_CACHE_SIZE = 2048
+BEATMAP_CACHE_TTL = 5 * 60  # seconds, so status changes made elsewhere show up
+
+# md5 -> (expiry, beatmap), least recently used first
+beatmaps: OrderedDict[str, tuple[float, Beatmap]] = OrderedDict()
+
+# id -> md5 of the entry above, evicted along with it
+beatmap_ids: dict[int, str] = {}
+
+# set id -> (expiry, md5s of every map in the set), least recently used first
+beatmap_sets: OrderedDict[int, tuple[float, list[str]]] = OrderedDict()
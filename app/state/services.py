@@ -4,6 +4,7 @@ from dataclasses import dataclass
 from typing import Any
 
 import aioredis
+from aiohttp import ClientSession
 from geoip2 import database as geoloc_database
 from motor.motor_asyncio import AsyncIOMotorClient
 
@@ -14,12 +15,20 @@ from app.constants.countries import OSU_GEOLOC
 client: AsyncIOMotorClient = None
 database = None
 
+http: ClientSession = None
+
 redis: aioredis.Redis = aioredis.from_url(str(app.config.REDIS_DSN))
-geoloc = geoloc_database.Reader("ext/geoloc.mmdb")
+# require the C extension, rather than silently falling back to pure python
+geoloc = geoloc_database.Reader(
+    "ext/geoloc.mmdb",
+    mode=geoloc_database.MODE_MMAP_EXT,
+)
 
 
 @dataclass
 class Country:
+    __slots__ = ("code", "acronym")
+
     code: int
     acronym: str
 
@@ -31,6 +40,8 @@ class Country:
 
 
 class Geolocation:
+    __slots__ = ("long", "lat", "country", "ip")
+
     def __init__(
         self,
         long: float = 0.0,
@@ -44,14 +55,23 @@ class Geolocation:
 
         self.ip = ip
 
+    def dict(self) -> dict[str, Any]:
+        return {
+            "long": self.long,
+            "lat": self.lat,
+            "country": {
+                "code": self.country.code,
+                "acronym": self.country.acronym,
+            },
+            "ip": self.ip,
+        }
+
     @classmethod
     def from_ip(self, headers: dict[str, Any]) -> Geolocation:
         if not (ip := headers.get("CF-Connecting-IP")):
-            forwards = headers["X-Forwarded-For"].split(",")
-
-            if len(forwards) != 1:
-                ip = forwards[0]
-            else:
+            # take the first forwarder if there are multiple, otherwise the real ip
+            ip, has_multiple, _ = headers["X-Forwarded-For"].partition(",")
+            if not has_multiple:
                 ip = headers["X-Real-IP"]
 
         if not (geoloc := app.state.cache.geoloc.get(ip)):
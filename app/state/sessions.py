@@ -23,17 +23,21 @@ bot: User
 
 
 async def populate_sessions() -> None:
-    app.state.sessions.bot = await app.usecases.user.fetch(id=1, db=True)
+    log.info("Fetching the bot user and all channels from the database!")
+
+    channel_collection = app.state.services.database.channels
+    app.state.sessions.bot, db_channels = await asyncio.gather(
+        app.usecases.user.fetch(id=1, db=True),
+        channel_collection.find({}).to_list(length=None),
+    )
+
     if not app.state.sessions.bot:
         raise RuntimeError("Bot user not found")
 
     app.state.sessions.users.append(bot)
     log.debug(f"Bot user {app.state.sessions.bot} added to user list.")
 
-    log.info("Fetching all channels from the database!")
-
-    channel_collection = app.state.services.database.channels
-    async for channel in channel_collection.find({}):
+    for channel in db_channels:
         channel.pop("_id")
         app.state.sessions.channels.append(Channel(**channel))
 
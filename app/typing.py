@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import struct
+from functools import lru_cache
 from typing import Any
 from typing import Awaitable
 from typing import Callable
@@ -44,15 +45,20 @@ PacketHandler = Callable[
 PubsubHandler = Callable[[str], Awaitable[None]]
 
 
-def read_int(data: bytearray, signed: bool = True) -> int:
-    return int.from_bytes(data, "little", signed=signed)
-
-
-def read_float(data: bytearray) -> float:
-    return struct.unpack("<f", data)
+I8_FMT = struct.Struct("<b")
+U8_FMT = struct.Struct("<B")
+I16_FMT = struct.Struct("<h")
+U16_FMT = struct.Struct("<H")
+I32_FMT = struct.Struct("<i")
+U32_FMT = struct.Struct("<I")
+F32_FMT = struct.Struct("<f")
+I64_FMT = struct.Struct("<q")
+F64_FMT = struct.Struct("<d")
 
 
 class osuType:
+    __slots__ = ()
+
     @classmethod
     def read(cls, packet: Packet) -> Any:
         ...
@@ -65,130 +71,146 @@ class osuType:
 class i8(osuType):
     @classmethod
     def read(cls, packet: Packet) -> int:
-        return read_int(packet.read(1))
+        return packet.unpack(I8_FMT)[0]
 
     @classmethod
     def write(cls, data: int) -> bytearray:
-        return struct.pack("<b", data)
+        return I8_FMT.pack(data)
 
 
 class u8(osuType):
     @classmethod
     def read(cls, packet: Packet) -> int:
-        return read_int(packet.read(1), signed=False)
+        return packet.unpack(U8_FMT)[0]
 
     @classmethod
     def write(cls, data: int) -> bytearray:
-        return struct.pack("<B", data)
+        return U8_FMT.pack(data)
 
 
 class i16(osuType):
     @classmethod
     def read(cls, packet: Packet) -> int:
-        return read_int(packet.read(2))
+        return packet.unpack(I16_FMT)[0]
 
     @classmethod
     def write(cls, data: int) -> bytearray:
-        return struct.pack("<h", data)
+        return I16_FMT.pack(data)
 
 
 class u16(osuType):
     @classmethod
     def read(cls, packet: Packet) -> int:
-        return read_int(packet.read(2), signed=False)
+        return packet.unpack(U16_FMT)[0]
 
     @classmethod
     def write(cls, data: int) -> bytearray:
-        return struct.pack("<H", data)
+        return U16_FMT.pack(data)
 
 
 class i32(osuType):
     @classmethod
     def read(cls, packet: Packet) -> int:
-        return read_int(packet.read(4))
+        return packet.unpack(I32_FMT)[0]
 
     @classmethod
     def write(cls, data: int) -> bytearray:
-        return struct.pack("<i", data)
+        return I32_FMT.pack(data)
+
+
+@lru_cache(maxsize=64)
+def i32_list_fmt(length: int) -> struct.Struct:
+    return struct.Struct(f"<H{length}I")
+
+
+@lru_cache(maxsize=64)
+def i32_array_fmt(length: int) -> struct.Struct:
+    return struct.Struct(f"<{length}I")
 
 
 class i32_list(osuType):
     @classmethod
     def read(cls, packet: Packet) -> list[int]:
-        length = i16.read(packet)
-        return struct.unpack(
-            f"<{'I' * length}",
-            packet.read(length * 4),
-        )
+        length = u16.read(packet)
+        return list(packet.unpack(i32_array_fmt(length)))
 
     @classmethod
     def write(cls, data: set[int]) -> bytearray:
-        buffer = bytearray(len(data).to_bytes(2, "little"))
-
-        for item in data:
-            buffer += item.to_bytes(4, "little")
-
-        return buffer
+        length = len(data)
+        return i32_list_fmt(length).pack(length, *data)
 
 
 class u32(osuType):
     @classmethod
     def read(cls, packet: Packet) -> int:
-        return read_int(packet.read(4), signed=False)
+        return packet.unpack(U32_FMT)[0]
 
     @classmethod
     def write(cls, data: int) -> bytearray:
-        return struct.pack("<I", data)
+        return U32_FMT.pack(data)
 
 
 class f32(osuType):
     @classmethod
-    def read(cls, packet: Packet) -> int:
-        return read_float(packet.read(4))
+    def read(cls, packet: Packet) -> float:
+        return packet.unpack(F32_FMT)[0]
 
     @classmethod
     def write(cls, data: float) -> bytearray:
-        return struct.pack("<f", data)
+        return F32_FMT.pack(data)
 
 
 class i64(osuType):
     @classmethod
     def read(cls, packet: Packet) -> int:
-        return read_int(packet.read(8))
+        return packet.unpack(I64_FMT)[0]
 
     @classmethod
     def write(cls, data: int) -> bytearray:
-        return struct.pack("<q", data)
+        return I64_FMT.pack(data)
 
 
 class f64(osuType):
     @classmethod
-    def read(cls, packet: Packet) -> int:
-        return read_float(packet.read(8))
+    def read(cls, packet: Packet) -> float:
+        return packet.unpack(F64_FMT)[0]
 
     @classmethod
     def write(cls, data: float) -> bytearray:
-        return struct.pack("<d", data)
+        return F64_FMT.pack(data)
 
 
 class String(osuType):
     @classmethod
     def read(cls, packet: Packet) -> str:
-        if u8.read(packet) != 0x0B:
+        # index the buffer directly, no per-byte unpacking or slicing
+        data = packet.data
+        offset = packet.offset
+
+        if data[offset] != 0x0B:
+            packet.offset = offset + 1
             return ""
 
-        length = shift = 0
+        length = data[offset + 1]
+        offset += 2
 
-        while True:
-            body = u8.read(packet)
+        # almost every string is under 128 bytes, so its length is a single byte
+        if length & 0b10000000:
+            length &= 0b01111111
+            shift = 7
 
-            length |= (body & 0b01111111) << shift
-            if (body & 0b10000000) == 0:
-                break
+            while True:
+                body = data[offset]
+                offset += 1
 
-            shift += 7
+                length |= (body & 0b01111111) << shift
+                if (body & 0b10000000) == 0:
+                    break
 
-        return packet.read(length).decode()
+                shift += 7
+
+        packet.offset = offset + length
+        return str(data[offset : offset + length], "utf-8")
 
     @classmethod
     def write(cls, data: str) -> bytearray:
@@ -249,13 +271,14 @@ class Message(osuType):
         return message.serialise()
 
     def serialise(self) -> bytearray:
-        data = bytearray(String.write(self.sender_username))
-
-        data += String.write(self.content)
-        data += String.write(self.recipient_username)
-        data += i32.write(self.sender_id)
-
-        return data
+        return bytearray().join(
+            (
+                String.write(self.sender_username),
+                String.write(self.content),
+                String.write(self.recipient_username),
+                I32_FMT.pack(self.sender_id),
+            ),
+        )
 
 
 class OsuChannel(osuType):
@@ -289,18 +312,40 @@ class OsuChannel(osuType):
         return channel.serialise()
 
     def serialise(self) -> bytearray:
-        data = bytearray(String.write(self.name))
-
-        data += String.write(self.topic)
-        data += i32.write(self.player_count)
-
-        return data
+        return bytearray().join(
+            (
+                String.write(self.name),
+                String.write(self.topic),
+                I32_FMT.pack(self.player_count),
+            ),
+        )
 
 
 SCOREFRAME_FMT = struct.Struct("<iBHHHHHHiHH?BB?")
+SCOREFRAME_V2_FMT = struct.Struct("<dd")  # combo portion, bonus portion
 
 
 class ScoreFrame(osuType):
+    __slots__ = (
+        "time",
+        "id",
+        "num300",
+        "num100",
+        "num50",
+        "num_geki",
+        "num_katu",
+        "num_miss",
+        "total_score",
+        "current_combo",
+        "max_combo",
+        "perfect",
+        "current_hp",
+        "tag_byte",
+        "score_v2",
+        "combo_portion",
+        "bonus_portion",
+    )
+
     def __init__(
         self,
         time: int,
@@ -343,13 +388,13 @@ class ScoreFrame(osuType):
 
     @classmethod
     def read(cls, packet: Packet) -> ScoreFrame:
-        # this is for speed, maybe ill write this out properly later
-        data = packet.read(29)
-        score_frame = ScoreFrame(*SCOREFRAME_FMT.unpack_from(data))
+        score_frame = ScoreFrame(*packet.unpack(SCOREFRAME_FMT))
 
         if score_frame.score_v2:
-            score_frame.combo_portion = f64.read(packet)
-            score_frame.bonus_portion = f64.read(packet)
+            (
+                score_frame.combo_portion,
+                score_frame.bonus_portion,
+            ) = packet.unpack(SCOREFRAME_V2_FMT)
 
         return score_frame
 
@@ -396,8 +441,8 @@ class ScoreFrame(osuType):
 
         return score_frame.serialise()
 
-    def serialise(self) -> bytearray:
-        return SCOREFRAME_FMT.pack(
+    def serialise(self) -> bytes:
+        data = SCOREFRAME_FMT.pack(
             self.time,
             self.id,
             self.num300,
@@ -415,8 +460,18 @@ class ScoreFrame(osuType):
             self.score_v2,
         )
 
+        if self.score_v2:
+            data += SCOREFRAME_V2_FMT.pack(self.combo_portion, self.bonus_portion)
+
+        return data
+
+
+REPLAYFRAME_FMT = struct.Struct("<BBffi")
+
 
 class ReplayFrame(osuType):
+    __slots__ = ("button_state", "taiko_byte", "x", "y", "time")
+
     def __init__(
         self,
         button_state: u8,
@@ -433,13 +488,7 @@ class ReplayFrame(osuType):
 
     @classmethod
     def read(cls, packet: Packet) -> ReplayFrame:
-        return ReplayFrame(
-            button_state=u8.read(packet),
-            taiko_byte=u8.read(packet),
-            x=f32.read(packet),
-            y=f32.read(packet),
-            time=i32.read(packet),
-        )
+        return ReplayFrame(*packet.unpack(REPLAYFRAME_FMT))
 
     @classmethod
     def write(
@@ -454,58 +503,80 @@ class ReplayFrame(osuType):
 
         return frame.serialise()
 
-    def serialise(self) -> bytearray:
-        data = bytearray(u8.write(self.button_state))
+    def serialise(self) -> bytes:
+        return REPLAYFRAME_FMT.pack(
+            self.button_state,
+            self.taiko_byte,
+            self.x,
+            self.y,
+            self.time,
+        )
 
-        data += u8.write(self.taiko_byte)
-        data += u8.write(self.taiko_byte)
-        data += f32.write(self.x)
-        data += f32.write(self.y)
-        data += i32.write(self.time)
 
-        return data
+BUNDLE_HEADER_FMT = struct.Struct("<iH")  # extra, frame count
 
 
 class ReplayFrameBundle(osuType):
+    __slots__ = ("_frames", "score_frame", "action", "extra", "sequence", "raw_data")
+
     def __init__(
         self,
-        frames: list[ReplayFrame],
+        frames: Optional[list[ReplayFrame]],
         score_frame: ScoreFrame,
         action: ReplayAction,
         extra: i32,  # ?
         sequence: u16,  # ?
-        raw_data: bytearray,
+        raw_data: bytes,
     ) -> None:
-        self.frames = frames
+        self._frames = frames
         self.score_frame = score_frame
         self.action = action
         self.extra = extra
         self.sequence = sequence
         self.raw_data = raw_data
 
+    @property
+    def frames(self) -> list[ReplayFrame]:
+        # frames are only decoded if something actually looks at them,
+        # spectator broadcasts just forward the raw bundle
+        if self._frames is None:
+            _, frame_count = BUNDLE_HEADER_FMT.unpack_from(self.raw_data)
+            start = BUNDLE_HEADER_FMT.size
+            end = start + REPLAYFRAME_FMT.size * frame_count
+
+            # iterate a view of the frame block instead of copying it out
+            with memoryview(self.raw_data) as view:
+                self._frames = [
+                    ReplayFrame(*frame)
+                    for frame in REPLAYFRAME_FMT.iter_unpack(view[start:end])
+                ]
+
+        return self._frames
+
     @classmethod
     def read(cls, packet: Packet) -> ReplayFrameBundle:
-        raw_data = packet.data[: packet.length]  # slice to copy
+        start = packet.offset
+
+        extra, frame_count = packet.unpack(BUNDLE_HEADER_FMT)
+        packet.offset += REPLAYFRAME_FMT.size * frame_count  # skip the frames
 
-        extra = i32.read(packet)
-        frame_count = u16.read(packet)
-        frames = [ReplayFrame.read() for _ in range(frame_count)]
         action = ReplayAction(u8.read(packet))
-        score_frame = ReplayFrame.read(packet)
+        score_frame = ScoreFrame.read(packet)
         sequence = u16.read(packet)
 
-        return ReplayFrameBundle(frames, score_frame, action, extra, sequence, raw_data)
+        raw_data = bytes(packet.data[start : packet.offset])  # copy out of the body
+        return ReplayFrameBundle(None, score_frame, action, extra, sequence, raw_data)
 
     @classmethod
     def write(
         cls,
         frames: list[ReplayFrame],
         score_frame: ScoreFrame,
-        action: ReplayFrame,
+        action: ReplayAction,
         extra: i32,  # ?
         sequence: u16,  # ?
-        raw_data: bytearray,
-    ) -> bytearray:
+        raw_data: bytes,
+    ) -> bytes:
         frame_bundle = ReplayFrameBundle(
             frames,
             score_frame,
@@ -517,20 +588,57 @@ class ReplayFrameBundle(osuType):
 
         return frame_bundle.serialise()
 
-    def serialise(self) -> bytearray:
-        data = bytearray(i32.write(self.extra))
+    def serialise(self) -> bytes:
+        if self.raw_data:
+            return self.raw_data
+
+        score_frame = self.score_frame.serialise()
+        frame_count = len(self.frames)
+
+        data = bytearray(
+            BUNDLE_HEADER_FMT.size
+            + REPLAYFRAME_FMT.size * frame_count
+            + U8_FMT.size
+            + len(score_frame)
+            + U16_FMT.size,
+        )
+
+        BUNDLE_HEADER_FMT.pack_into(data, 0, self.extra, frame_count)
+        offset = BUNDLE_HEADER_FMT.size
 
-        data += u16.write(len(self.frames))
         for frame in self.frames:
-            data += frame.serialise()
+            REPLAYFRAME_FMT.pack_into(
+                data,
+                offset,
+                frame.button_state,
+                frame.taiko_byte,
+                frame.x,
+                frame.y,
+                frame.time,
+            )
+            offset += REPLAYFRAME_FMT.size
+
+        U8_FMT.pack_into(data, offset, self.action.value)
+        offset += U8_FMT.size
 
-        data += self.score_frame.serialise()
-        data += u16.write(self.sequence)
-        data += u8.write(self.action.value)
+        data[offset : offset + len(score_frame)] = score_frame
+        offset += len(score_frame)
+
+        U16_FMT.pack_into(data, offset, self.sequence)
 
         return data
 
 
+MATCH_HEADER_FMT = struct.Struct("<HBBi")  # id, in progress, powerplay, mods
+MATCH_SLOTS_FMT = struct.Struct("<16B16B")  # slot statuses, slot teams
+MATCH_FOOTER_FMT = struct.Struct("<iBBBB")  # host, mode, win cond, team type, freemod
+MATCH_SLOT_MODS_FMT = struct.Struct("<16i")
+
+# enum calls are slow, look the members up by value instead
+SLOT_STATUSES = {status.value: status for status in SlotStatus}
+MATCH_TEAMS = {team.value: team for team in MatchTeams}
+
+
 class OsuMatch(osuType):
     def __init__(
         self,
@@ -584,8 +692,9 @@ class OsuMatch(osuType):
         map_name = String.read(packet)
         map_id = i32.read(packet)
         map_md5 = String.read(packet)
-        slot_statuses = [SlotStatus(i8.read(packet)) for _ in range(16)]
-        slot_teams = [MatchTeams(i8.read(packet)) for _ in range(16)]
+        slots = packet.unpack(MATCH_SLOTS_FMT)
+        slot_statuses = [SLOT_STATUSES[status] for status in slots[:16]]
+        slot_teams = [MATCH_TEAMS[team] for team in slots[16:]]
 
         slot_ids = []
         for status in slot_statuses:
@@ -600,7 +709,7 @@ class OsuMatch(osuType):
 
         slot_mods = []
         if freemod:
-            slot_mods = [Mods(i32.read(packet)) for _ in range(16)]
+            slot_mods = [Mods(mods) for mods in packet.unpack(MATCH_SLOT_MODS_FMT)]
 
         seed = i32.read(packet)
 
@@ -671,42 +780,81 @@ class OsuMatch(osuType):
         return match.serialise()
 
     def serialise(self, send_pw: bool = True) -> bytearray:
-        data = bytearray(u16.write(self.id))
-
-        data += i8.write(int(self.in_progress))
-        data += i8.write(0)  # ?
-        data += i32.write(self.mods.value)
-        data += String.write(self.name)
+        name = String.write(self.name)
 
         if self.password:
-            if send_pw:
-                data += String.write(self.password)
-            else:
-                data += b"\x0b\x00"
+            password = String.write(self.password) if send_pw else b"\x0b\x00"
         else:
-            data += b"\x00"
+            password = b"\x00"
+
+        map_name = String.write(self.map_name)
+        map_md5 = String.write(self.map_md5)
+
+        slot_count = len(self.slot_ids)
+        mods_size = MATCH_SLOT_MODS_FMT.size if self.freemod else 0
+
+        data = bytearray(
+            MATCH_HEADER_FMT.size
+            + len(name)
+            + len(password)
+            + len(map_name)
+            + I32_FMT.size
+            + len(map_md5)
+            + MATCH_SLOTS_FMT.size
+            + I32_FMT.size * slot_count
+            + MATCH_FOOTER_FMT.size
+            + mods_size
+            + I32_FMT.size,
+        )
+
+        MATCH_HEADER_FMT.pack_into(
+            data,
+            0,
+            self.id,
+            int(self.in_progress),
+            0,  # ?
+            self.mods.value,
+        )
+        offset = MATCH_HEADER_FMT.size
 
-        data += String.write(self.map_name)
-        data += i32.write(self.map_id)
-        data += String.write(self.map_md5)
+        for string in (name, password, map_name):
+            data[offset : offset + len(string)] = string
+            offset += len(string)
 
-        data.extend([status.value for status in self.slot_statuses])
-        data.extend([team.value for team in self.slot_teams])
+        I32_FMT.pack_into(data, offset, self.map_id)
+        offset += I32_FMT.size
 
-        for idx, slot_status in enumerate(self.slot_statuses):
-            if slot_status & SlotStatus.HAS_USER:
-                data += i32.write(self.slot_ids[idx])
+        data[offset : offset + len(map_md5)] = map_md5
+        offset += len(map_md5)
 
-        data += i32.write(self.host_id)
-        data += i8.write(self.mode.value)
-        data += i8.write(self.win_condition.value)
-        data += i8.write(self.team_type.value)
-        data += i8.write(int(self.freemod))
+        # the enums are int subclasses, struct packs them without touching .value
+        MATCH_SLOTS_FMT.pack_into(
+            data,
+            offset,
+            *self.slot_statuses,
+            *self.slot_teams,
+        )
+        offset += MATCH_SLOTS_FMT.size
+
+        # slot ids only hold the occupied slots, in slot order
+        i32_array_fmt(slot_count).pack_into(data, offset, *self.slot_ids)
+        offset += I32_FMT.size * slot_count
+
+        MATCH_FOOTER_FMT.pack_into(
+            data,
+            offset,
+            self.host_id,
+            self.mode.value,
+            self.win_condition.value,
+            self.team_type.value,
+            int(self.freemod),
+        )
+        offset += MATCH_FOOTER_FMT.size
 
         if self.freemod:
-            for mod in self.slot_mods:
-                data += i32.write(mod.value)
+            MATCH_SLOT_MODS_FMT.pack_into(data, offset, *self.slot_mods)
+            offset += mods_size
 
-        data += i32.write(self.seed)
+        I32_FMT.pack_into(data, offset, self.seed)
 
         return data
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import asyncio
+import time
 from datetime import datetime
 from typing import Any
+from typing import Awaitable
+from typing import Callable
 from typing import Optional
+from typing import TypeVar
+from typing import Union
 
-from aiohttp import ClientSession
 from fastapi import status
+from pymongo import UpdateOne
 
 import app.config
 import app.state
@@ -14,82 +20,192 @@ from app.objects.beatmap import Beatmap
 from app.objects.beatmap import RankedStatus
 
 
+# md5, map id or ("set", set id)
+FetchKey = Union[str, int, tuple[str, int]]
+T = TypeVar("T")
+
+# lookups in flight, so concurrent fetches of the same map share one query
+fetching: dict[FetchKey, asyncio.Task] = {}
+
+
+def cache_beatmap(beatmap: Beatmap) -> Beatmap:
+    # hand back the instance we already hold, so in-place updates (e.g. !rank)
+    # are seen by everything that fetched the map
+    if cached := cached_beatmap(beatmap.md5):
+        app.state.cache.beatmap_ids[cached.id] = cached.md5
+        return cached
+
+    beatmaps = app.state.cache.beatmaps
+    beatmaps[beatmap.md5] = (
+        time.monotonic() + app.state.cache.BEATMAP_CACHE_TTL,
+        beatmap,
+    )
+    app.state.cache.beatmap_ids[beatmap.id] = beatmap.md5
+
+    if len(beatmaps) > app.state.cache.BEATMAP_CACHE_SIZE:
+        uncache_beatmap(next(iter(beatmaps)))
+
+    return beatmap
+
+
+def cached_beatmap(md5: str) -> Optional[Beatmap]:
+    if not (cached := app.state.cache.beatmaps.get(md5)):
+        return None
+
+    expiry, beatmap = cached
+    if expiry <= time.monotonic():
+        uncache_beatmap(md5)
+        return None
+
+    app.state.cache.beatmaps.move_to_end(md5)
+    return beatmap
+
+
+def uncache_beatmap(md5: str) -> None:
+    if not (cached := app.state.cache.beatmaps.pop(md5, None)):
+        return
+
+    # the id may already point at a newer version of the map
+    _, beatmap = cached
+    if app.state.cache.beatmap_ids.get(beatmap.id) == md5:
+        del app.state.cache.beatmap_ids[beatmap.id]
+
+
+def cache_set(set_id: int, beatmaps: list[Beatmap]) -> list[Beatmap]:
+    beatmaps = [cache_beatmap(beatmap) for beatmap in beatmaps]
+
+    sets = app.state.cache.beatmap_sets
+    sets[set_id] = (
+        time.monotonic() + app.state.cache.BEATMAP_CACHE_TTL,
+        [beatmap.md5 for beatmap in beatmaps],
+    )
+    sets.move_to_end(set_id)
+    if len(sets) > app.state.cache.BEATMAP_CACHE_SIZE:
+        sets.popitem(last=False)
+
+    return beatmaps
+
+
+def cached_set(set_id: int) -> Optional[list[Beatmap]]:
+    sets = app.state.cache.beatmap_sets
+    if not (cached := sets.get(set_id)):
+        return None
+
+    expiry, md5s = cached
+    if expiry <= time.monotonic():
+        del sets[set_id]
+        return None
+
+    beatmaps = []
+    for md5 in md5s:
+        # one of the maps was evicted, so refetch the whole set
+        if (beatmap := cached_beatmap(md5)) is None:
+            return None
+
+        beatmaps.append(beatmap)
+
+    sets.move_to_end(set_id)
+    return beatmaps
+
+
+async def coalesce_fetch(
+    key: FetchKey,
+    fetch: Callable[[], Awaitable[T]],
+) -> T:
+    if (task := fetching.get(key)) is None:
+        task = fetching[key] = app.state.create_task(fetch())
+        task.add_done_callback(lambda _: fetching.pop(key, None))
+
+    # shielded so one cancelled caller doesn't cancel the lookup for the rest
+    return await asyncio.shield(task)
+
+
 async def fetch_by_md5(md5: str) -> Optional[Beatmap]:
-    if beatmap := await md5_from_database(md5):
+    if beatmap := cached_beatmap(md5):
         return beatmap
 
+    return await coalesce_fetch(md5, lambda: _fetch_by_md5(md5))
+
+
+async def _fetch_by_md5(md5: str) -> Optional[Beatmap]:
+    if beatmap := await md5_from_database(md5):
+        return cache_beatmap(beatmap)
+
     if beatmap := await md5_from_api(md5):
-        return beatmap
+        return cache_beatmap(beatmap)
 
 
 async def fetch_by_id(id: int) -> Optional[Beatmap]:
-    if beatmap := await id_from_database(id):
+    if (md5 := app.state.cache.beatmap_ids.get(id)) and (
+        beatmap := cached_beatmap(md5)
+    ):
         return beatmap
 
+    return await coalesce_fetch(id, lambda: _fetch_by_id(id))
+
+
+async def _fetch_by_id(id: int) -> Optional[Beatmap]:
+    if beatmap := await id_from_database(id):
+        return cache_beatmap(beatmap)
+
     if beatmap := await id_from_api(id):
-        return beatmap
+        return cache_beatmap(beatmap)
 
 
 async def fetch_by_set_id(set_id: int) -> Optional[list[Beatmap]]:
-    if beatmaps := await set_from_database(set_id):
+    if beatmaps := cached_set(set_id):
         return beatmaps
 
-    if beatmaps := await set_from_api(set_id):
-        return beatmaps
+    return await coalesce_fetch(("set", set_id), lambda: _fetch_by_set_id(set_id))
 
 
-async def md5_from_database(md5: str) -> Optional[Beatmap]:
-    map_collection = app.state.services.database.maps
-    map_document = await map_collection.find_one({"md5": md5})
+async def _fetch_by_set_id(set_id: int) -> Optional[list[Beatmap]]:
+    if beatmaps := await set_from_database(set_id):
+        return cache_set(set_id, beatmaps)
+
+    if beatmaps := await set_from_api(set_id):
+        return cache_set(set_id, beatmaps)
 
-    if not map_document:
-        return None
 
-    # move into parse function perhaps?
+def parse_from_database(map_document: dict[str, Any]) -> Beatmap:
     map_document["status"] = RankedStatus(int(map_document["status"]))
     map_document["mode"] = Mode(int(map_document["mode"]))
     map_document["last_update"] = datetime.fromisoformat(map_document["last_update"])
-    map_document.pop("_id")
 
     return Beatmap(**map_document)
 
 
-async def id_from_database(id: int) -> Optional[Beatmap]:
+async def md5_from_database(md5: str) -> Optional[Beatmap]:
     map_collection = app.state.services.database.maps
-    map_document = await map_collection.find_one({"id": id})
+    map_document = await map_collection.find_one({"md5": md5}, {"_id": 0})
 
     if not map_document:
         return None
 
-    # move into parse function perhaps?
-    map_document["status"] = RankedStatus(int(map_document["status"]))
-    map_document["mode"] = Mode(int(map_document["mode"]))
-    map_document["last_update"] = datetime.fromisoformat(map_document["last_update"])
-    map_document.pop("_id")
+    return parse_from_database(map_document)
 
-    return Beatmap(**map_document)
+
+async def id_from_database(id: int) -> Optional[Beatmap]:
+    map_collection = app.state.services.database.maps
+    map_document = await map_collection.find_one({"id": id}, {"_id": 0})
+
+    if not map_document:
+        return None
+
+    return parse_from_database(map_document)
 
 
 async def set_from_database(set_id: int) -> Optional[list[Beatmap]]:
     map_collection = app.state.services.database.maps
-    map_documents = map_collection.find({"set_id": set_id})
+    map_documents = await map_collection.find(
+        {"set_id": set_id},
+        {"_id": 0},
+    ).to_list(length=None)
 
     if not map_documents:
         return None
 
-    maps = []
-    async for map_document in map_documents:
-        # move into parse function perhaps?
-        map_document["status"] = RankedStatus(int(map_document["status"]))
-        map_document["mode"] = Mode(int(map_document["mode"]))
-        map_document["last_update"] = datetime.fromisoformat(
-            map_document["last_update"],
-        )
-        map_document.pop("_id")
-
-        maps.append(Beatmap(**map_document))
-
-    return maps
+    return [parse_from_database(map_document) for map_document in map_documents]
 
 
 GET_BEATMAP_URL = "https://old.ppy.sh/api/get_beatmaps"
@@ -104,23 +220,35 @@ async def save_to_database(beatmap: Beatmap) -> None:
     )
 
 
+async def save_many_to_database(beatmaps: list[Beatmap]) -> None:
+    if not beatmaps:
+        return
+
+    map_collection = app.state.services.database.maps
+    await map_collection.bulk_write(
+        [
+            UpdateOne({"md5": beatmap.md5}, {"$set": beatmap.dict()}, upsert=True)
+            for beatmap in beatmaps
+        ],
+        ordered=False,
+    )
+
+
 async def md5_from_api(md5: str) -> Optional[Beatmap]:
-    async with ClientSession() as session:
-        async with session.get(
-            GET_BEATMAP_URL,
-            params={"k": str(app.config.OSU_API_KEY), "h": md5},
-        ) as response:
-            if not response or response.status != status.HTTP_200_OK:
-                return None
-
-            response_json = await response.json()
-            if not response_json:
-                return None
+    async with app.state.services.http.get(
+        GET_BEATMAP_URL,
+        params={"k": str(app.config.OSU_API_KEY), "h": md5},
+    ) as response:
+        if not response or response.status != status.HTTP_200_OK:
+            return None
+
+        response_json = await response.json()
+        if not response_json:
+            return None
 
     beatmaps = parse_from_osu_api(response_json)
 
-    for beatmap in beatmaps:
-        await save_to_database(beatmap)
+    await save_many_to_database(beatmaps)
 
     for beatmap in beatmaps:
         if beatmap.md5 == md5:
@@ -128,22 +256,20 @@ async def md5_from_api(md5: str) -> Optional[Beatmap]:
 
 
 async def id_from_api(id: int) -> Optional[Beatmap]:
-    async with ClientSession() as session:
-        async with session.get(
-            GET_BEATMAP_URL,
-            params={"k": str(app.config.OSU_API_KEY), "b": id},
-        ) as response:
-            if not response or response.status != status.HTTP_200_OK:
-                return None
-
-            response_json = await response.json()
-            if not response_json:
-                return None
+    async with app.state.services.http.get(
+        GET_BEATMAP_URL,
+        params={"k": str(app.config.OSU_API_KEY), "b": id},
+    ) as response:
+        if not response or response.status != status.HTTP_200_OK:
+            return None
+
+        response_json = await response.json()
+        if not response_json:
+            return None
 
     beatmaps = parse_from_osu_api(response_json)
 
-    for beatmap in beatmaps:
-        await save_to_database(beatmap)
+    await save_many_to_database(beatmaps)
 
     for beatmap in beatmaps:
         if beatmap.id == id:
@@ -151,28 +277,28 @@ async def id_from_api(id: int) -> Optional[Beatmap]:
 
 
 async def set_from_api(set_id: int) -> Optional[list[Beatmap]]:
-    async with ClientSession() as session:
-        async with session.get(
-            GET_BEATMAP_URL,
-            params={"k": str(app.config.OSU_API_KEY), "s": set_id},
-        ) as response:
-            if not response or response.status != status.HTTP_200_OK:
-                return None
-
-            response_json = await response.json()
-            if not response_json:
-                return None
+    async with app.state.services.http.get(
+        GET_BEATMAP_URL,
+        params={"k": str(app.config.OSU_API_KEY), "s": set_id},
+    ) as response:
+        if not response or response.status != status.HTTP_200_OK:
+            return None
+
+        response_json = await response.json()
+        if not response_json:
+            return None
 
     beatmaps = parse_from_osu_api(response_json)
 
-    for beatmap in beatmaps:
-        await save_to_database(beatmap)
+    await save_many_to_database(beatmaps)
     return beatmaps
 
 
 IGNORED_BEATMAP_CHARS = dict.fromkeys(map(ord, r':\/*<>?"|'), None)
 
-FROZEN_STATUSES = (RankedStatus.RANKED, RankedStatus.APPROVED, RankedStatus.LOVED)
+FROZEN_STATUSES = frozenset(
+    (RankedStatus.RANKED, RankedStatus.APPROVED, RankedStatus.LOVED),
+)
 
 
 def parse_from_osu_api(
@@ -199,15 +325,8 @@ def parse_from_osu_api(
             .translate(IGNORED_BEATMAP_CHARS)
         )
 
-        last_update_string = response_json["last_update"]
-        last_update = datetime(
-            year=int(last_update_string[0:4]),
-            month=int(last_update_string[5:7]),
-            day=int(last_update_string[8:10]),
-            hour=int(last_update_string[11:13]),
-            minute=int(last_update_string[14:16]),
-            second=int(last_update_string[17:19]),
-        )
+        # "YYYY-MM-DD HH:MM:SS", which fromisoformat parses in C
+        last_update = datetime.fromisoformat(response_json["last_update"])
 
         total_length = int(response_json["total_length"])
 
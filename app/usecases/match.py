@@ -46,14 +46,21 @@ def enqueue(
 
 
 def enqueue_state(match: Match, lobby: bool = True) -> None:
-    match.chat.enqueue(app.packets.update_match(match, send_pw=True))
+    lobby_chat = app.state.sessions.channels["#lobby"] if lobby else None
+    to_lobby = lobby_chat is not None and bool(lobby_chat.users)
 
-    if (
-        lobby
-        and (lobby_chat := app.state.sessions.channels["#lobby"])
-        and lobby_chat.users
-    ):
-        lobby_chat.enqueue(app.packets.update_match(match, send_pw=False))
+    if not match.chat.users and not to_lobby:
+        return  # nobody to tell, don't bother serialising
+
+    data = app.packets.update_match(match, send_pw=True)
+    match.chat.enqueue(data)
+
+    if to_lobby:
+        # without a password both variants are the same bytes
+        if match.password:
+            data = app.packets.update_match(match, send_pw=False)
+
+        lobby_chat.enqueue(data)
 
 
 def from_packet(packet_match: OsuMatch) -> Match:
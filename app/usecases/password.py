@@ -1,25 +1,60 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import hmac
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import bcrypt
 
-cache: dict[str, str] = {}
+CACHE_SIZE = 4096
+CACHE_TTL = 5 * 60  # seconds
+
+# per-process key, so cached digests are useless outside this process
+pepper = os.urandom(32)
+
+# hashed password -> (expiry, keyed digest of the plain password md5),
+# least recently used first
+cache: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+# bcrypt releases the gil, so threads run checks in parallel; keeping them
+# off the default executor stops logins from queueing behind other work
+executor = ThreadPoolExecutor(
+    max_workers=os.cpu_count(),
+    thread_name_prefix="bcrypt",
+)
+
+
+def password_digest(plain_password: bytes) -> bytes:
+    return hmac.new(pepper, plain_password, hashlib.blake2b).digest()
 
 
 async def verify_password(plain_password: bytes, hashed_password: str) -> bool:
-    if hashed_password in cache:
-        return cache[hashed_password] == plain_password
+    digest = password_digest(plain_password)
+
+    if cached := cache.get(hashed_password):
+        expiry, cached_digest = cached
+
+        if expiry > time.monotonic():
+            cache.move_to_end(hashed_password)
+            return hmac.compare_digest(cached_digest, digest)
+
+        del cache[hashed_password]
 
     loop = asyncio.get_running_loop()
     result = await loop.run_in_executor(
-        None,
+        executor,
         bcrypt.checkpw,
         plain_password,
         hashed_password.encode(),
     )
 
     if result:
-        cache[hashed_password] = plain_password
+        cache[hashed_password] = (time.monotonic() + CACHE_TTL, digest)
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
 
     return result
@@ -1,15 +1,19 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 from typing import TypedDict
 
-from aiohttp import ClientSession
 from aisuru_pp_py import Calculator
 from aisuru_pp_py import ScoreParams
 from fastapi import status
 
+import app.state
 from app.constants.mods import Mods
 from app.objects.beatmap import Beatmap
 
@@ -36,58 +40,151 @@ DATA_PATH = Path("/home/james/aisuru/web/data")
 BEATMAPS_PATH = DATA_PATH / "beatmaps"
 
 
-def calculate_score(_score_params: ScoreParameters, osu_file_path: Path) -> ScoreResult:
-    calculator = Calculator(str(osu_file_path))
+CALCULATOR_CACHE_SIZE = 1024
 
-    score_params = ScoreParams(
-        mods=_score_params["mods"].value,
-        acc=_score_params["acc"],
-        nMisses=_score_params["nmiss"],
-        combo=_score_params["max_combo"],
-    )
+# map md5 -> parsed map, least recently used first. keyed by md5 so a changed
+# .osu file can never hit a stale entry. calculators are shared between
+# executor threads, and nothing guarantees they're safe to use concurrently,
+# so each one carries a lock held for the duration of a calculation
+calculators: OrderedDict[str, tuple[Calculator, threading.Lock]] = OrderedDict()
 
-    (result,) = calculator.calculate(score_params)
 
-    return ScoreResult(
-        pp=round(result.pp, 2),
-        sr=round(result.stars, 2),
-        ar=round(result.ar, 2),
-        cs=round(result.cs, 2),
-        od=round(result.od, 2),
-        bpm=round(result.bpm, 2),
-    )
+async def get_calculator(
+    bmap: Beatmap,
+) -> Optional[tuple[Calculator, threading.Lock]]:
+    if (cached := calculators.get(bmap.md5)) is not None:
+        calculators.move_to_end(bmap.md5)
+        return cached
 
+    osu_file_path = BEATMAPS_PATH / f"{bmap.id}.osu"
+    if not await check_local_file(osu_file_path, bmap.id, bmap.md5):
+        return None
+
+    loop = asyncio.get_running_loop()
+    calculator = await loop.run_in_executor(None, Calculator, str(osu_file_path))
+
+    cached = calculators[bmap.md5] = (calculator, threading.Lock())
+    if len(calculators) > CALCULATOR_CACHE_SIZE:
+        calculators.popitem(last=False)
+
+    return cached
+
+
+def calculate_scores(
+    calculator: Calculator,
+    lock: threading.Lock,
+    _score_params: list[ScoreParameters],
+) -> list[ScoreResult]:
+    score_params_list = [
+        ScoreParams(
+            mods=score_params["mods"].value,
+            acc=score_params["acc"],
+            nMisses=score_params["nmiss"],
+            combo=score_params["max_combo"],
+        )
+        for score_params in _score_params
+    ]
+
+    with lock:
+        results = calculator.calculate(score_params_list)
+
+    return [
+        ScoreResult(
+            pp=round(result.pp, 2),
+            sr=round(result.stars, 2),
+            ar=round(result.ar, 2),
+            cs=round(result.cs, 2),
+            od=round(result.od, 2),
+            bpm=round(result.bpm, 2),
+        )
+        for result in results
+    ]
+
+
+def file_md5(path: Path) -> str:
+    with path.open("rb") as file:
+        if hasattr(hashlib, "file_digest"):  # 3.11+
+            return hashlib.file_digest(file, "md5").hexdigest()
+
+        md5 = hashlib.md5()
+        while chunk := file.read(1 << 16):
+            md5.update(chunk)
+
+        return md5.hexdigest()
 
-async def check_local_file(osu_file_path: Path, map_id: int, map_md5: str) -> bool:
-    if (
-        not osu_file_path.exists()
-        or hashlib.md5(osu_file_path.read_bytes()).hexdigest() != map_md5
-    ):
-        async with ClientSession() as session:
-            async with session.get(f"https://old.ppy.sh/osu/{map_id}") as response:
-                if response.status != status.HTTP_200_OK:
-                    return False
 
-                osu_file_path.write_bytes(await response.read())
+# path -> (size, mtime, md5), so unchanged files aren't hashed again
+file_hashes: dict[Path, tuple[int, int, str]] = {}
+
+
+async def local_file_md5(path: Path) -> Optional[str]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+
+    size, mtime = stat.st_size, stat.st_mtime_ns
+    if (cached := file_hashes.get(path)) and cached[:2] == (size, mtime):
+        return cached[2]
+
+    loop = asyncio.get_running_loop()
+    md5 = await loop.run_in_executor(None, file_md5, path)
+
+    file_hashes[path] = (size, mtime, md5)
+    return md5
+
+
+async def check_local_file(osu_file_path: Path, map_id: int, map_md5: str) -> bool:
+    if await local_file_md5(osu_file_path) != map_md5:
+        async with app.state.services.http.get(
+            f"https://old.ppy.sh/osu/{map_id}",
+        ) as response:
+            if response.status != status.HTTP_200_OK:
+                return False
+
+            osu_file = await response.read()
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, osu_file_path.write_bytes, osu_file)
+
+        # we already have the bytes, so seed the cache rather than reading them back
+        stat = osu_file_path.stat()
+        file_hashes[osu_file_path] = (
+            stat.st_size,
+            stat.st_mtime_ns,
+            hashlib.md5(osu_file).hexdigest(),
+        )
 
     return True
 
 
 async def np_msg(bmap: Beatmap, mods: Mods) -> str:
-    pp_results: dict[float, ScoreResult] = {}
-    for acc in (95.0, 97.0, 98.0, 99.0, 100.0):
-        params = ScoreParameters(
+    if (cached := await get_calculator(bmap)) is None:
+        return "Something went wrong"
+
+    calculator, lock = cached
+
+    accuracies = (95.0, 97.0, 98.0, 99.0, 100.0)
+    params = [
+        ScoreParameters(
             mods=mods,
             acc=acc,
             nmiss=0,
             max_combo=bmap.max_combo,
         )
+        for acc in accuracies
+    ]
+
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(
+        None,
+        calculate_scores,
+        calculator,
+        lock,
+        params,
+    )
 
-        osu_file_path = BEATMAPS_PATH / f"{bmap.id}.osu"
-        if not await check_local_file(osu_file_path, bmap.id, bmap.md5):
-            return "Something went wrong"
-
-        pp_results[acc] = calculate_score(params, osu_file_path)
+    pp_results: dict[float, ScoreResult] = dict(zip(accuracies, results))
 
     mod_str = " "
     if mods > Mods.NOMOD:
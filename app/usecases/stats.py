@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+from typing import Optional
+
 import app.state
 from app.constants.mode import Mode
+from app.constants.mode import MODES
 from app.models import DBStats
 from app.objects.stats import Stats
 
@@ -12,26 +15,50 @@ async def fetch(user_id: int, country: str, mode: Mode) -> Stats:
 
     db_stats = DBStats(**stats)
 
-    global_rank = await app.state.services.redis.zrevrank(
-        f"aisuru:leaderboard:{int(mode)}",
-        user_id,
-    )
-    if global_rank is not None:
-        global_rank += 1
-    else:
-        global_rank = 0
-
-    country_rank = await app.state.services.redis.zrevrank(
-        f"aisuru:leaderboard:{int(mode)}:{country}",
-        user_id,
-    )
-    if country_rank is not None:
-        country_rank += 1
-    else:
-        country_rank = 0
+    # both ranks in one round trip
+    async with app.state.services.redis.pipeline(transaction=False) as pipe:
+        pipe.zrevrank(f"aisuru:leaderboard:{int(mode)}", user_id)
+        pipe.zrevrank(f"aisuru:leaderboard:{int(mode)}:{country}", user_id)
+
+        global_rank, country_rank = await pipe.execute()
+
+    global_rank = global_rank + 1 if global_rank is not None else 0
+    country_rank = country_rank + 1 if country_rank is not None else 0
 
     return Stats(
         global_rank=global_rank,
         country_rank=country_rank,
         **db_stats.__dict__,
     )
+
+
+async def fetch_ranks(user_id: int, country: str) -> list[Optional[int]]:
+    # global & country rank for every mode, in one round trip
+    async with app.state.services.redis.pipeline(transaction=False) as pipe:
+        for mode in MODES:
+            pipe.zrevrank(f"aisuru:leaderboard:{int(mode)}", user_id)
+            pipe.zrevrank(f"aisuru:leaderboard:{int(mode)}:{country}", user_id)
+
+        return await pipe.execute()
+
+
+def from_documents(
+    stats_documents: list[dict],
+    ranks: list[Optional[int]],
+) -> dict[Mode, Stats]:
+    db_stats = {
+        stats_document["mode"]: DBStats(**stats_document)
+        for stats_document in stats_documents
+    }
+
+    stats = {}
+    for idx, mode in enumerate(MODES):
+        global_rank, country_rank = ranks[idx * 2 : idx * 2 + 2]
+
+        stats[mode] = Stats(
+            global_rank=global_rank + 1 if global_rank is not None else 0,
+            country_rank=country_rank + 1 if country_rank is not None else 0,
+            **db_stats[mode.value].__dict__,
+        )
+
+    return stats
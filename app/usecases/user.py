@@ -1,15 +1,15 @@
 from __future__ import annotations
 
-import copy
+import asyncio
+import secrets
 import time
+from collections import deque
 from datetime import date
 from datetime import datetime
 from datetime import timedelta
 from typing import Optional
-from typing import Union
-from uuid import uuid4
 
-import orjson
+from pymongo import UpdateOne
 
 import app.models
 import app.packets
@@ -19,6 +19,7 @@ import app.utils
 import log
 from app.constants.action import Action
 from app.constants.mode import Mode
+from app.constants.mode import MODES
 from app.constants.mods import Mods
 from app.constants.privileges import Privileges
 from app.constants.status import Status
@@ -43,29 +44,46 @@ async def create_session(
 ) -> Optional[User]:
     user_collection = app.state.services.database.users
 
-    user = await user_collection.find_one(
-        {"safe_name": app.utils.make_safe_name(login_data["username"])},
-    )
-    if not user:
+    # pull the user and all of their stats documents in one round trip
+    users = await user_collection.aggregate(
+        [
+            {"$match": {"safe_name": app.utils.make_safe_name(login_data["username"])}},
+            {"$limit": 1},
+            {
+                "$lookup": {
+                    "from": "ustats",
+                    "localField": "id",
+                    "foreignField": "user_id",
+                    "as": "stats",
+                },
+            },
+        ],
+    ).to_list(length=1)
+    if not users:
         return None
 
+    user = users[0]
+    stats_documents = user.pop("stats")
+
     db_user = DBUser(**user)
-    db_dict = db_user.__dict__
+    db_dict = {key: val for key, val in db_user.__dict__.items() if key != "country"}
+
+    # the ranks only need the geolocated country, so send both together
+    pending = [
+        app.usecases.stats.fetch_ranks(db_user.id, geolocation.country.acronym),
+    ]
 
-    db_country = db_dict.pop("country")
+    db_country = db_user.country
     if not db_country or db_country == "xx":
-        await user_collection.update_one(
-            {"id": db_user.id},
-            {"$set": {"country": geolocation.country.acronym}},
+        pending.append(
+            user_collection.update_one(
+                {"id": db_user.id},
+                {"$set": {"country": geolocation.country.acronym}},
+            ),
         )
 
-    stats = {}
-    for mode in Mode:
-        stats[mode] = await app.usecases.stats.fetch(
-            db_user.id,
-            geolocation.country.acronym,
-            mode,
-        )
+    ranks, *_ = await asyncio.gather(*pending)
+    stats = app.usecases.stats.from_documents(stats_documents, ranks)
 
     return User(  # TODO: convert user to dataclass to simplify this
         **db_dict,
@@ -74,10 +92,10 @@ async def create_session(
         utc_offset=login_data["utc_offset"],
         status=Status.default(),
         login_time=int(time.time()),
-        token=str(uuid4()),
-        queue=bytearray(),
+        token=secrets.token_hex(16),
+        queue=deque(),
         stats=stats,
-        channels=[],
+        channels=set(),
         spectating=None,
         spectators=[],
         stealth=False,
@@ -89,38 +107,41 @@ async def create_session(
     )
 
 
-KWARGS_VALUES = Union[int, str]
-
-
-def _parse_kwargs(
-    kwargs: dict[str, KWARGS_VALUES],
-) -> Optional[tuple[str, KWARGS_VALUES]]:
-    for kwarg in ("id", "name", "token"):
-        if val := kwargs.pop(kwarg, None):
-            return (kwarg, val)
-
-    return None
-
+def cache_fetch(
+    *,
+    id: Optional[int] = None,
+    name: Optional[str] = None,
+    token: Optional[str] = None,
+) -> Optional[User]:
+    users = app.state.sessions.users
 
-def cache_fetch(**kwargs) -> Optional[User]:
-    if not (kwarg := _parse_kwargs(kwargs)):
-        raise ValueError("incorrect kwargs passed to user.cache_fetch()")
+    if id:
+        return users.by_id.get(id)
+    elif name:
+        return users.by_name.get(name)
+    elif token:
+        return users.by_token.get(token)
 
-    key, val = kwarg
-    for user in app.state.sessions.users:
-        if getattr(user, key) == val:
-            return user
+    raise ValueError("incorrect kwargs passed to user.cache_fetch()")
 
 
-async def fetch(**kwargs) -> Optional[User]:
-    if user := cache_fetch(**kwargs):
+async def fetch(
+    *,
+    id: Optional[int] = None,
+    name: Optional[str] = None,
+    token: Optional[str] = None,
+    db: bool = False,
+) -> Optional[User]:
+    if user := cache_fetch(id=id, name=name, token=token):
         return user
 
-    if kwargs.get("db"):
-        if not (kwarg := _parse_kwargs(kwargs)):
-            raise ValueError("incorrect kwargs passed to user.fetch()")
-
-        key, val = kwarg
+    if db:
+        if id:
+            key, val = "id", id
+        elif name:
+            key, val = "name", name
+        else:
+            key, val = "token", token
 
         user_collection = app.state.services.database.users
         user = await user_collection.find_one(
@@ -130,8 +151,9 @@ async def fetch(**kwargs) -> Optional[User]:
             return None
 
         db_user = DBUser(**user)
-        db_dict = copy.copy(db_user.__dict__)
-        db_dict.pop("country")
+        db_dict = {
+            key: val for key, val in db_user.__dict__.items() if key != "country"
+        }
 
         return User(  # TODO: convert user to dataclass to simplify this
             **db_dict,
@@ -141,9 +163,9 @@ async def fetch(**kwargs) -> Optional[User]:
             status=Status.default(),
             login_time=int(time.time()),
             token="",
-            queue=bytearray(),
+            queue=deque(),
             stats={},  # TODO
-            channels=[],
+            channels=set(),
             spectating=None,
             spectators=[],
             stealth=False,
@@ -156,38 +178,40 @@ async def fetch(**kwargs) -> Optional[User]:
 
 
 async def save_login(user: User) -> None:
-    login_collection = app.state.services.database.logins
-    await login_collection.insert_one(
-        {
-            "userid": user.id,
-            "ip": user.geolocation.ip,
-            "osu_ver": user.client_info.client.date_str,
-            "osu_stream": user.client_info.client.stream,
-            "datetime": datetime.now().isoformat(),
-        },
-    )
+    now = datetime.now().isoformat()
 
-    hashes_collection = app.state.services.database.client_hashes
-    await hashes_collection.update_one(
-        {
-            "userid": user.id,
-            "osu_md5": user.client_info.osu_md5,
-            "adapters": user.client_info.adapters_md5,
-            "uninstall": user.client_info.uninstall_md5,
-            "disk": user.client_info.disk_md5,
-        },
-        {
-            "$inc": {"occurrences": 1},
-            "$set": {"latest_time": datetime.now().isoformat()},
-            "$setOnInsert": {
+    # the two writes are independent, so send them together
+    await asyncio.gather(
+        app.state.services.database.logins.insert_one(
+            {
+                "userid": user.id,
+                "ip": user.geolocation.ip,
+                "osu_ver": user.client_info.client.date_str,
+                "osu_stream": user.client_info.client.stream,
+                "datetime": now,
+            },
+        ),
+        app.state.services.database.client_hashes.update_one(
+            {
                 "userid": user.id,
                 "osu_md5": user.client_info.osu_md5,
                 "adapters": user.client_info.adapters_md5,
                 "uninstall": user.client_info.uninstall_md5,
                 "disk": user.client_info.disk_md5,
             },
-        },
-        upsert=True,
+            {
+                "$inc": {"occurrences": 1},
+                "$set": {"latest_time": now},
+                "$setOnInsert": {
+                    "userid": user.id,
+                    "osu_md5": user.client_info.osu_md5,
+                    "adapters": user.client_info.adapters_md5,
+                    "uninstall": user.client_info.uninstall_md5,
+                    "disk": user.client_info.disk_md5,
+                },
+            },
+            upsert=True,
+        ),
     )
 
 
@@ -212,8 +236,6 @@ async def find_hardware_matches(user: User) -> Optional[list[int]]:
 
 
 def logout(user: User) -> None:
-    user.token = ""
-
     if host := user.spectating:
         remove_spectator(host, user)
 
@@ -221,6 +243,7 @@ def logout(user: User) -> None:
         channel.remove_user(user)
 
     app.state.sessions.users.remove(user)
+    user.token = ""  # after removal, the token is what it's indexed by
 
     if not user.restricted:
         app.state.sessions.users.enqueue(app.packets.logout(user.id))
@@ -267,6 +290,7 @@ def join_match(user: User, match: Match, password: str) -> bool:
 
     slot.status = SlotStatus.NOT_READY
     slot.user = user
+    match.occupied_count += 1
 
     user.match = match
     user.enqueue(app.packets.match_join_success(match))
@@ -289,10 +313,11 @@ def leave_match(user: User) -> None:
         new_status = SlotStatus.OPEN
 
     slot.reset(new_status=new_status)
+    user.match.occupied_count -= 1
 
     leave_channel(user, user.match.chat)
 
-    if all(slot.empty() for slot in user.match.slots):
+    if not user.match.occupied_count:
         log.info(f"Match {user.match} is empty, deleting")
 
         app.state.sessions.matches.remove(user.match)
@@ -327,7 +352,8 @@ async def set_privileges(user: User, privileges: Privileges) -> None:
 
     await app.state.services.redis.publish(
         "user-privileges",
-        orjson.dumps({"id": user.id, "privileges": privileges.value}),
+        # both fields are ints, so the payload can be formatted directly
+        f'{{"id":{user.id},"privileges":{privileges.value}}}'.encode(),
     )
 
 
@@ -335,6 +361,29 @@ async def add_privilege(user: User, privilege: Privileges) -> None:
     await set_privileges(user, user.privileges | privilege)
 
 
+def enqueue_channel_info(channel: Channel, data: Optional[bytes] = None) -> None:
+    if data is None:
+        data = app.packets.channel_info(channel)
+
+    # instance channels only go to their members. channels default to
+    # Privileges.NORMAL, so nearly every other channel is filtered below;
+    # only one created with no privileges at all skips the check
+    if channel.instance:
+        targets = channel.users
+    elif not channel.privileges:
+        targets = app.state.sessions.users
+    else:
+        targets = [
+            target
+            for target in app.state.sessions.users
+            if target.privileges & channel.privileges
+        ]
+
+    # append to the queues directly, this runs for everyone online
+    for target in targets:
+        target.queue.append(data)
+
+
 def join_channel(user: User, channel: Channel) -> bool:
     if (
         user in channel
@@ -345,18 +394,11 @@ def join_channel(user: User, channel: Channel) -> bool:
         return False
 
     channel.add_user(user)
-    user.channels.append(channel)
+    user.channels.add(channel)
 
     user.enqueue(app.packets.channel_join(channel.name))
 
-    channel_info_packet = app.packets.channel_info(channel)
-    if channel.instance:
-        for target in channel.users:
-            target.enqueue(channel_info_packet)
-    else:
-        for target in app.state.sessions.users:
-            if channel.has_permission(target.privileges):
-                target.enqueue(channel_info_packet)
+    enqueue_channel_info(channel)
 
     log.info(f"{user} joined {channel}")
     return True
@@ -372,14 +414,7 @@ def leave_channel(user: User, channel: Channel, kick: bool = False) -> None:
     if kick:
         user.enqueue(app.packets.channel_kick(channel.name))
 
-    channel_info_packet = app.packets.channel_info(channel)
-    if channel.instance:
-        for user in channel.users:
-            user.enqueue(channel_info_packet)
-    else:
-        for user in app.state.sessions.users:
-            if channel.has_permission(user.privileges):
-                user.enqueue(channel_info_packet)
+    enqueue_channel_info(channel)
 
     log.info(f"{user} left {channel}")
 
@@ -406,13 +441,13 @@ def add_spectator(user: User, other_user: User) -> None:
         fellow_joined = app.packets.spectator_joined(other_user.id)
 
         for spec in user.spectators:
-            spec.enqueue(fellow_joined)
-            other_user.enqueue(app.packets.spectator_joined(spec.id))
+            spec.queue.append(fellow_joined)
+            other_user.queue.append(app.packets.spectator_joined(spec.id))
 
         user.enqueue(app.packets.host_spectator_joined(other_user.id))
     else:
         for spec in user.spectators:
-            other_user.enqueue(app.packets.spectator_joined(spec.id))
+            other_user.queue.append(app.packets.spectator_joined(spec.id))
 
     user.spectators.append(other_user)
     other_user.spectating = user
@@ -431,35 +466,72 @@ def remove_spectator(user: User, other_user: User) -> None:
         leave_channel(user, channel)
     else:
         channel_info = app.packets.channel_info(channel)
-        fellow_packet = app.packets.spectator_left(other_user.id)
+        fellow_packet = app.packets.spectator_left(other_user.id) + channel_info
 
         user.enqueue(channel_info)
         for spec in user.spectators:
-            spec.enqueue(fellow_packet + channel_info)
+            spec.queue.append(fellow_packet)
 
     user.enqueue(app.packets.host_spectator_left(other_user.id))
     log.info(f"{other_user} stopped spectating {user}")
 
 
-async def update_activity(user: User) -> None:
+ACTIVITY_FLUSH_INTERVAL = 5  # seconds
+
+# user id -> latest activity not yet written to the database
+pending_activity: dict[int, int] = {}
+
+
+def update_activity(user: User) -> None:
     latest = int(time.time())
 
+    user.latest_activity = latest
+    pending_activity[user.id] = latest
+
+
+async def flush_activity() -> None:
+    global pending_activity
+
+    if not pending_activity:
+        return
+
+    activity, pending_activity = pending_activity, {}
+
     user_collection = app.state.services.database.users
-    await user_collection.update_one(
-        {"id": user.id},
-        {"$set": {"latest_activity": latest}},
-    )
+    try:
+        await user_collection.bulk_write(
+            [
+                UpdateOne({"id": user_id}, {"$set": {"latest_activity": latest}})
+                for user_id, latest in activity.items()
+            ],
+            ordered=False,
+        )
+    except BaseException:
+        # requeue for the next flush, without clobbering anything newer
+        pending_activity = activity | pending_activity
+        raise
 
-    user.latest_activity = latest
+
+async def flush_activity_loop() -> None:
+    while True:
+        await asyncio.sleep(ACTIVITY_FLUSH_INTERVAL)
+
+        try:
+            await flush_activity()
+        except Exception as exc:
+            log.error(f"Failed to flush user activity: {exc}")
 
 
 def update_status(user: User, action_struct: app.models.ChangeActionStructure) -> None:
-    user.status.action = Action(action_struct.action)
-    user.status.info_text = action_struct.info_text
-    user.status.map_md5 = action_struct.map_md5
-    user.status.mods = Mods(action_struct.mods)
-    user.status.mode = Mode(action_struct.mode)
-    user.status.map_id = action_struct.map_id
+    # statuses are shared (see Status.default), so replace rather than mutate
+    user.status = Status(
+        Action(action_struct.action),
+        action_struct.info_text,
+        action_struct.map_md5,
+        Mods(action_struct.mods),
+        Mode(action_struct.mode),
+        action_struct.map_id,
+    )
 
     if not user.restricted:
         app.state.sessions.users.enqueue(app.packets.user_stats(user))
@@ -474,11 +546,11 @@ async def add_friend(user: User, other_user: User) -> None:
         )
         return
 
-    user.friends.append(other_user.id)
+    user.friends.add(other_user.id)
     user_collection = app.state.services.database.users
     await user_collection.update_one(
         {"id": user.id},
-        {"$push": {"friends": other_user.id}},
+        {"$addToSet": {"friends": other_user.id}},
     )
 
     log.info(f"{user} added {other_user} to their friends list")
@@ -491,7 +563,7 @@ async def remove_friend(user: User, other_user: User) -> None:
         )
         return
 
-    user.friends.append(other_user.id)
+    user.friends.remove(other_user.id)
     user_collection = app.state.services.database.users
     await user_collection.update_one(
         {"id": user.id},
@@ -502,57 +574,50 @@ async def remove_friend(user: User, other_user: User) -> None:
 
 
 async def handle_restriction(user: User) -> None:
-    for mode in Mode:
-        leaderboard_str = f"aisuru:leaderboard:{mode.value}"
-        country_leaderboard_str = (
-            f"{leaderboard_str}:{user.geolocation.country.acronym}"
-        )
+    async with app.state.services.redis.pipeline(transaction=False) as pipe:
+        for mode in MODES:
+            leaderboard_str = f"aisuru:leaderboard:{mode.value}"
+            country_leaderboard_str = (
+                f"{leaderboard_str}:{user.geolocation.country.acronym}"
+            )
 
-        stats = user.stats[mode]
-        stats.global_rank = 0
-        stats.country_rank = 0
+            stats = user.stats[mode]
+            stats.global_rank = 0
+            stats.country_rank = 0
+
+            pipe.zrem(leaderboard_str, user.id)
+            pipe.zrem(country_leaderboard_str, user.id)
 
-        await app.state.services.redis.zrem(leaderboard_str, user.id)
-        await app.state.services.redis.zrem(country_leaderboard_str, user.id)
+        await pipe.execute()
 
     logout(user)  # reconnect them xd
 
 
 async def handle_unrestriction(user: User) -> None:
-    for mode in Mode:
-        leaderboard_str = f"aisuru:leaderboard:{mode.value}"
-        country_leaderboard_str = (
-            f"{leaderboard_str}:{user.geolocation.country.acronym}"
-        )
+    # re-add & re-rank every mode in a single round trip
+    async with app.state.services.redis.pipeline(transaction=False) as pipe:
+        for mode in MODES:
+            leaderboard_str = f"aisuru:leaderboard:{mode.value}"
+            country_leaderboard_str = (
+                f"{leaderboard_str}:{user.geolocation.country.acronym}"
+            )
 
-        stats = user.stats[mode]
+            stats = user.stats[mode]
 
-        await app.state.services.redis.zadd(leaderboard_str, {user.id: stats.pp})
-        await app.state.services.redis.zadd(
-            country_leaderboard_str,
-            {user.id: stats.pp},
-        )
+            pipe.zadd(leaderboard_str, {user.id: stats.pp})
+            pipe.zadd(country_leaderboard_str, {user.id: stats.pp})
+            pipe.zrevrank(leaderboard_str, user.id)
+            pipe.zrevrank(country_leaderboard_str, user.id)
 
-        global_rank = await app.state.services.redis.zrevrank(
-            leaderboard_str,
-            user.id,
-        )
-        if global_rank is not None:
-            global_rank += 1
-        else:
-            global_rank = 0
+        results = await pipe.execute()
 
-        country_rank = await app.state.services.redis.zrevrank(
-            country_leaderboard_str,
-            user.id,
-        )
-        if country_rank is not None:
-            country_rank += 1
-        else:
-            country_rank = 0
+    # 4 results per mode: 2 zadds, then the global & country ranks
+    for idx, mode in enumerate(MODES):
+        global_rank, country_rank = results[idx * 4 + 2 : idx * 4 + 4]
 
-        stats.global_rank = global_rank
-        stats.country_rank = country_rank
+        stats = user.stats[mode]
+        stats.global_rank = global_rank + 1 if global_rank is not None else 0
+        stats.country_rank = country_rank + 1 if country_rank is not None else 0
 
     logout(user)  # reconnect them xd
 
@@ -571,25 +636,6 @@ async def handle_unfreeze(user: User) -> None:
     logout(user)  # reconnect them xd
 
 
-async def set_privileges(user: User, privileges: Privileges) -> None:
-    user.privileges = privileges
-
-    user_collection = app.state.services.database.users
-    await user_collection.update_one(
-        {"id": user.id},
-        {"$set": {"privileges": privileges}},
-    )
-
-    await app.state.services.redis.publish(
-        "user-privileges",
-        orjson.dumps({"id": user.id, "privileges": privileges.value}),
-    )
-
-
-async def add_privilege(user: User, privilege: Privileges) -> None:
-    await set_privileges(user, user.privileges | privilege)
-
-
 async def remove_privilege(user: User, privilege: Privileges) -> None:
     await set_privileges(user, user.privileges & ~privilege)
 
@@ -1,19 +1,33 @@
 from __future__ import annotations
 
+import functools
 import importlib
-import inspect
+import sys
 from typing import Any
 
-import app
 import log
 
 
+@functools.lru_cache(maxsize=4096)
 def make_safe_name(name: str) -> str:
     return name.replace(" ", "_").lower()
 
 
 CLASSES = {}
 
+# class name -> class, for every class reachable from a loaded app module
+CLASS_INDEX: dict[str, type] = {}
+
+
+def index_loaded_classes() -> None:
+    for name, module in sorted(sys.modules.items()):
+        if module is None or not name.startswith("app."):
+            continue
+
+        for attr, obj in vars(module).items():
+            if isinstance(obj, type):
+                CLASS_INDEX.setdefault(attr, obj)
+
 
 def get_class_from_module(module_name: str) -> Any:
     if _class := CLASSES.get(module_name):
@@ -21,13 +35,15 @@ def get_class_from_module(module_name: str) -> Any:
 
     module_name_split = module_name.split(".")
 
-    if len(module_name_split) == 1:  # what the fuck is this code LOL
-        for _, _obj in inspect.getmembers(app):
-            if inspect.ismodule(_obj):
-                for name, obj in inspect.getmembers(_obj):
-                    if inspect.isclass(obj) and name == module_name_split[0]:
-                        CLASSES[module_name] = obj
-                        return obj
+    if len(module_name_split) == 1:
+        if not (obj := CLASS_INDEX.get(module_name)):
+            # modules may have been loaded since the last pass
+            index_loaded_classes()
+            obj = CLASS_INDEX.get(module_name)
+
+        if obj:
+            CLASSES[module_name] = obj
+            return obj
 
     try:
         module = importlib.import_module(".".join(module_name_split[:-1]))
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from app.objects.lists import UserList
+
+
+class FakeUser:
+    def __init__(self, id: int, name: str, token: str) -> None:
+        self.id = id
+        self.name = name
+        self.token = token
+
+
+def test_multiple_sessions_for_one_account() -> None:
+    users = UserList()
+    first = FakeUser(3, "cookiezi", "a")
+    second = FakeUser(3, "cookiezi", "b")
+
+    users.append(first)
+    users.append(second)
+
+    # the earliest session is the one looked up
+    assert users.by_id[3] is first
+    assert users.by_name["cookiezi"] is first
+
+    # removing it hands the keys over to the session still online
+    users.remove(first)
+    assert 3 in users
+    assert "cookiezi" in users
+    assert users.by_id[3] is second
+    assert users.by_name["cookiezi"] is second
+    assert "a" not in users.by_token
+    assert users.by_token["b"] is second
+
+    users.remove(second)
+    assert 3 not in users
+    assert "cookiezi" not in users
+    assert not users.by_token
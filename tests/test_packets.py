@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import app.packets
+from app.objects.match import Match
+from app.objects.match import SlotStatus
+from app.typing import OsuMatch
+
+
+class FakeUser:
+    def __init__(self, id: int) -> None:
+        self.id = id
+
+
+def test_locked_occupied_slot_round_trips() -> None:
+    match = Match()
+    match.name = "test"
+    match.host_id = 10
+
+    match.slots[0].user = FakeUser(10)
+    match.slots[0].status = SlotStatus.NOT_READY
+
+    # the host locked an occupied slot, the user stays but no id is sent
+    match.slots[1].user = FakeUser(11)
+    match.slots[1].status = SlotStatus.LOCKED
+
+    data = app.packets.write_match(match).serialise()
+    osu_match = OsuMatch.read(app.packets.Packet(0, len(data), bytearray(data)))
+
+    assert osu_match.slot_ids == [10]
+    assert osu_match.host_id == 10
+    assert osu_match.mode == match.mode